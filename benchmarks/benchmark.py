@@ -0,0 +1,329 @@
+'''
+# benchmark.py
+
+goals:
+- measure the generator, the csv -> parquet pipeline and the dashboard callbacks at several dataset scales,
+  so performance changes can be proven instead of guessed
+
+functionality:
+- scales are every combination of --locations (number of stores) and --years (calendar years starting 2023)
+    - up to 19 stores are taken from restaurant_details.py, larger counts use a synthetic portfolio (store_portfolio.py)
+- stages:
+    - generate: sales_data_creator.py writes the csv for the scale
+    - convert: sales_data_pipeline.py converts that csv to the parquet file the app reads
+    - dashboard: dash_app/app.py is imported against that parquet file (startup, the time until it can answer requests),
+      its store is built and mapped (ready, from the same start), and every callback is called with a fixed set of
+      slicer states (the per-call mean latency is reported)
+        - each call starts from empty selection and result caches, so it pays for its own filtering and grouping
+        - dashboard:interaction calls all five callbacks with the same state, the way one slicer change fires them,
+          and reports the mean latency and the peak memory allocated by an interaction (allocated_mb, traced
+          with tracemalloc in a separate untimed pass)
+        - dashboard:interaction_cached repeats the interactions with the result cache kept, the way users flip
+          back to states they have seen
+- every stage runs in a fresh child process, so peak RSS is the stage's own high-water mark
+- each result records wall time, rows, rows/sec, peak RSS and output file size, and all results are written
+  to a json file (benchmarks/results/ by default)
+- --compare reads two result files and flags every matching result whose wall time or peak RSS grew by more
+  than --threshold (exit code 1 when there is a regression)
+
+usage:
+- python benchmarks/benchmark.py
+- python benchmarks/benchmark.py --locations 1 5 --years 1 --stages generate convert
+- python benchmarks/benchmark.py --compare benchmarks/results/before.json benchmarks/results/after.json --threshold 0.1
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, os.pardir)
+DATA_PIPELINE_DIRECTORY = os.path.join(PROJECT_DIRECTORY, 'data_pipeline')
+DASH_APP_DIRECTORY = os.path.join(PROJECT_DIRECTORY, 'dash_app')
+RESULTS_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, 'results')
+
+DEFAULT_LOCATIONS = [1, 5, 20]
+DEFAULT_YEARS = [1, 3]
+STAGES = ['generate', 'convert', 'dashboard']
+FIRST_YEAR = 2023
+SEED = 42
+
+# the slicer inputs of each dashboard callback, in argument order
+CALLBACK_INPUTS = {
+    'update_total_net_sales': ['region', 'location', 'start_date', 'end_date', 'category', 'menu_item'],
+    'update_sales_by_category': ['region', 'location', 'start_date', 'end_date', 'category', 'menu_item'],
+    'update_sales_by_region': ['region', 'location', 'start_date', 'end_date', 'menu_item'],
+    'update_top_25_menu_items': ['region', 'location', 'start_date', 'end_date'],
+    'update_sales_by_location': ['region', 'location', 'start_date', 'end_date', 'menu_item'],
+}
+
+# metrics where a higher value in the new results is a regression
+COMPARED_METRICS = ['wall_seconds', 'peak_rss_mb', 'allocated_mb']
+
+# Function to read this process's peak RSS (and its children's) in MB
+def peak_rss_mb():
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes on linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# Function to name the files of a scale inside the work directory
+def scale_paths(work_directory, location_count, year_count):
+    scale_directory = os.path.join(work_directory, f"locations_{location_count}_years_{year_count}")
+    os.makedirs(scale_directory, exist_ok=True)
+    return {
+        'portfolio': os.path.join(scale_directory, 'store_portfolio.parquet'),
+        'csv': os.path.join(scale_directory, 'sales_data.csv'),
+        'app_data': os.path.join(scale_directory, 'app_data'),
+    }
+
+def result(stage, location_count, year_count, rows, wall_seconds, output_bytes=None, allocated_mb=None):
+    return {
+        'stage': stage,
+        'locations': location_count,
+        'years': year_count,
+        'rows': rows,
+        'wall_seconds': wall_seconds,
+        'rows_per_second': rows / wall_seconds if wall_seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'output_bytes': output_bytes,
+        'allocated_mb': allocated_mb,
+    }
+
+# stage run in the child process: generate the csv for a scale
+def run_generate_stage(paths, location_count, year_count, workers):
+    sys.path.insert(0, DATA_PIPELINE_DIRECTORY)
+    import sales_data_creator as creator
+    from restaurant_details import locations
+    from store_portfolio import scale_portfolio, write_portfolio
+
+    if location_count <= len(locations):
+        portfolio = {location_name: locations[location_name] for location_name in list(locations)[:location_count]}
+    else:
+        portfolio = scale_portfolio(location_count, seed=SEED)
+    write_portfolio(portfolio, paths['portfolio'])
+
+    start = time.perf_counter()
+    sink = creator.CsvSalesSink(paths['csv'])
+    try:
+        batches = creator.iter_simulation(seed=SEED, workers=workers, start_date=f"{FIRST_YEAR}-01-01",
+                                          end_date=f"{FIRST_YEAR + year_count - 1}-12-31", portfolio_path=paths['portfolio'])
+        for batch in batches:
+            sink.write(batch)
+    finally:
+        sink.close()
+    wall_seconds = time.perf_counter() - start
+
+    return [result('generate', location_count, year_count, sink.rows_written, wall_seconds, os.path.getsize(paths['csv']))]
+
+# stage run in the child process: convert the csv of a scale to the app's parquet file
+def run_convert_stage(paths, location_count, year_count):
+    sys.path.insert(0, DATA_PIPELINE_DIRECTORY)
+    import sales_data_pipeline as pipeline
+
+    os.makedirs(paths['app_data'], exist_ok=True)
+    parquet_file_path = os.path.join(paths['app_data'], 'sales_data.parquet')
+
+    start = time.perf_counter()
+    rows = pipeline.convert_csv_to_parquet(paths['csv'], parquet_file_path)
+    wall_seconds = time.perf_counter() - start
+
+    return [result('convert', location_count, year_count, rows, wall_seconds, os.path.getsize(parquet_file_path))]
+
+# Function to empty the app's selection and result caches
+def clear_app_caches(app):
+    app.store.selected_rows.cache_clear()
+    app.result_cache.clear()
+
+# Function to build the slicer states the dashboard callbacks are timed with, from the app's store.
+# dates are passed as iso strings, the way dcc.DatePickerRange sends them
+def slicer_states(store):
+    first_date, last_date = store.first_date, store.last_date
+    start_date, end_date = first_date.strftime('%Y-%m-%d'), last_date.strftime('%Y-%m-%d')
+    regions = sorted(store.values['region'])
+    locations = sorted(store.values['location'])
+    categories = sorted(store.values['category'])
+    menu_items = sorted(store.values['menu_item'])
+    no_selection = {'region': None, 'location': None, 'start_date': start_date, 'end_date': end_date, 'category': None, 'menu_item': None}
+    return {
+        'no_selection': no_selection,
+        'region': {**no_selection, 'region': regions[0]},
+        'locations': {**no_selection, 'location': locations[:2]},
+        'category': {**no_selection, 'category': categories[0]},
+        'menu_items': {**no_selection, 'menu_item': menu_items[:3]},
+        'one_week': {**no_selection, 'end_date': (first_date + timedelta(days=6)).strftime('%Y-%m-%d')},
+    }
+
+# stage run in the child process: import the app against the scale's data and time every callback
+def run_dashboard_stage(paths, location_count, year_count, repeats):
+    os.environ['APP_DATA_DIRECTORY'] = paths['app_data']
+    # a fresh store directory, so startup includes building the store
+    os.environ['APP_STORE_DIRECTORY'] = tempfile.mkdtemp(prefix='serving_store_', dir=paths['app_data'])
+    sys.path.insert(0, DASH_APP_DIRECTORY)
+
+    start = time.perf_counter()
+    import app
+    startup_seconds = time.perf_counter() - start
+    rows = app.current_store().rows
+    ready_seconds = time.perf_counter() - start
+    results = [
+        result('dashboard_startup', location_count, year_count, rows, startup_seconds),
+        result('dashboard_ready', location_count, year_count, rows, ready_seconds),
+    ]
+
+    states = slicer_states(app.store)
+    for callback_name, inputs in CALLBACK_INPUTS.items():
+        callback = getattr(app, callback_name)
+        wall_seconds = 0.0
+        for _ in range(repeats):
+            for state in states.values():
+                clear_app_caches(app)
+                start = time.perf_counter()
+                callback(*[state[name] for name in inputs])
+                wall_seconds += time.perf_counter() - start
+        wall_seconds /= repeats * len(states)
+        results.append(result(f"dashboard:{callback_name}", location_count, year_count, rows, wall_seconds))
+
+    # one slicer change fires every callback with the same state
+    def interact(state, cached=False):
+        if not cached:
+            clear_app_caches(app)
+        for callback_name, inputs in CALLBACK_INPUTS.items():
+            getattr(app, callback_name)(*[state[name] for name in inputs])
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for state in states.values():
+            interact(state)
+    wall_seconds = (time.perf_counter() - start) / (repeats * len(states))
+
+    allocated_bytes = 0
+    tracemalloc.start()
+    for state in states.values():
+        held_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        interact(state)
+        allocated_bytes = max(allocated_bytes, tracemalloc.get_traced_memory()[1] - held_bytes)
+    tracemalloc.stop()
+    results.append(result('dashboard:interaction', location_count, year_count, rows, wall_seconds, allocated_mb=allocated_bytes / 1024 ** 2))
+
+    for state in states.values():
+        interact(state, cached=True)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for state in states.values():
+            interact(state, cached=True)
+    wall_seconds = (time.perf_counter() - start) / (repeats * len(states))
+    results.append(result('dashboard:interaction_cached', location_count, year_count, rows, wall_seconds))
+
+    return results
+
+# Function to run one stage of one scale in a child process and collect its results
+def run_stage_in_child(stage, work_directory, location_count, year_count, workers, repeats):
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-stage', stage, '--work-dir', work_directory,
+        '--locations', str(location_count), '--years', str(year_count), '--workers', str(workers), '--repeats', str(repeats),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{stage} stage failed for {location_count} locations x {year_count} years:\n{completed.stderr}")
+    # the child prints its results as the last line of stdout
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def print_results(results):
+    print(f"\n{'stage':<38}{'locations':>10}{'years':>6}{'rows':>14}{'seconds':>10}{'rows/sec':>14}{'peak MB':>10}{'output MB':>11}{'alloc MB':>10}")
+    for item in results:
+        output_mb = f"{item['output_bytes'] / 1024 ** 2:.1f}" if item['output_bytes'] is not None else '-'
+        rows_per_second = f"{item['rows_per_second']:,.0f}" if item['rows_per_second'] else '-'
+        allocated_mb = f"{item['allocated_mb']:.0f}" if item.get('allocated_mb') is not None else '-'
+        print(f"{item['stage']:<38}{item['locations']:>10}{item['years']:>6}{item['rows']:>14,}{item['wall_seconds']:>10.3f}"
+              f"{rows_per_second:>14}{item['peak_rss_mb']:>10.0f}{output_mb:>11}{allocated_mb:>10}")
+
+# Function to compare two result files and return the regressions
+def compare_results(baseline_path, candidate_path, threshold):
+    with open(baseline_path) as file:
+        baseline = {(item['stage'], item['locations'], item['years']): item for item in json.load(file)['results']}
+    with open(candidate_path) as file:
+        candidate = json.load(file)['results']
+
+    regressions = []
+    print(f"\n{'stage':<38}{'locations':>10}{'years':>6}{'metric':>14}{'before':>12}{'after':>12}{'change':>10}")
+    for item in candidate:
+        key = (item['stage'], item['locations'], item['years'])
+        if key not in baseline:
+            continue
+        for metric in COMPARED_METRICS:
+            before = baseline[key].get(metric)
+            after = item.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            flag = ' REGRESSION' if change > threshold else ''
+            print(f"{item['stage']:<38}{item['locations']:>10}{item['years']:>6}{metric:>14}{before:>12.3f}{after:>12.3f}{change:>+10.1%}{flag}")
+            if flag:
+                regressions.append({'key': key, 'metric': metric, 'before': before, 'after': after, 'change': change})
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the generator, pipeline and dashboard at several dataset scales.")
+    parser.add_argument('--locations', type=int, nargs='+', default=DEFAULT_LOCATIONS, help="store counts to benchmark")
+    parser.add_argument('--years', type=int, nargs='+', default=DEFAULT_YEARS, help="numbers of years to benchmark")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="stages to run, in pipeline order")
+    parser.add_argument('--workers', type=int, default=1, help="generator worker processes")
+    parser.add_argument('--repeats', type=int, default=3, help="times each dashboard callback is called per slicer state")
+    parser.add_argument('--work-dir', default=None, help="directory for the generated data (a temporary directory by default)")
+    parser.add_argument('--output', default=None, help="results json file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'), help="compare two result files")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative increase flagged as a regression by --compare")
+    parser.add_argument('--run-stage', choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # child process mode: run a single stage of a single scale and print its results
+    if args.run_stage:
+        paths = scale_paths(args.work_dir, args.locations[0], args.years[0])
+        if args.run_stage == 'generate':
+            stage_results = run_generate_stage(paths, args.locations[0], args.years[0], args.workers)
+        elif args.run_stage == 'convert':
+            stage_results = run_convert_stage(paths, args.locations[0], args.years[0])
+        else:
+            stage_results = run_dashboard_stage(paths, args.locations[0], args.years[0], args.repeats)
+        print(json.dumps(stage_results))
+        sys.exit(0)
+
+    if args.compare:
+        regressions = compare_results(*args.compare, args.threshold)
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}\n")
+        sys.exit(1 if regressions else 0)
+
+    work_directory = args.work_dir or tempfile.mkdtemp(prefix='restaurant_benchmark_')
+    results = []
+    for location_count in args.locations:
+        for year_count in args.years:
+            for stage in STAGES:
+                if stage not in args.stages:
+                    continue
+                print(f"Running {stage} for {location_count} locations x {year_count} years")
+                results.extend(run_stage_in_child(stage, work_directory, location_count, year_count, args.workers, args.repeats))
+
+    print_results(results)
+
+    output_file_path = args.output
+    if output_file_path is None:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        output_file_path = os.path.join(RESULTS_DIRECTORY, f"benchmark_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    with open(output_file_path, 'w') as file:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, file, indent=2)
+    print(f"\nWrote results to {output_file_path}\n")
@@ -0,0 +1,132 @@
+'''
+# parquet_layouts.py
+
+goals:
+- choose the parquet profile the pipeline pins (PARQUET_PROFILES in sales_data_pipeline.py) by measuring what
+  each codec, level, dictionary setting and row group size costs in storage and in read latency
+
+functionality:
+- the csv is parsed once with the pipeline's block reader and held in memory as an arrow table, so every layout
+  is written from the same source and the write time excludes csv parsing
+- every combination of --codecs, --dictionary and --row-group-rows is written to a temporary file and measured:
+    - write_seconds: writing the table to parquet
+    - read_seconds: reading every column back into arrow (what the dashboard pays at startup)
+    - subset_read_seconds: reading only --subset-columns (what a projected read pays)
+    - size_mb: the file size
+- read times are the best of --repeats reads from the page cache, so they measure decoding rather than the disk
+- results print as a table sorted by read time and can be written to a json file with --output
+- the pinned profiles of the pipeline are measured too (--profiles)
+
+usage:
+- python benchmarks/parquet_layouts.py data_pipeline/generated_data/sales_data_per_location_2024-09-26_16-50-15.csv
+- python benchmarks/parquet_layouts.py <csv> --codecs zstd:1 zstd:3 lz4 --dictionary on --row-group-rows 100000
+'''
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIRECTORY, os.pardir, 'data_pipeline'))
+import sales_data_pipeline as pipeline
+
+# codec[:level] specs, level left to pyarrow's default when omitted
+DEFAULT_CODECS = ['brotli', 'brotli:5', 'zstd:1', 'zstd:3', 'zstd:9', 'snappy', 'lz4', 'none']
+DEFAULT_ROW_GROUP_ROWS = [100_000, 1_000_000]
+DEFAULT_SUBSET_COLUMNS = ['date', 'region', 'net_sales']
+
+# Function to read a csv into a single arrow table with the pipeline's block reader and schema
+def read_source(csv_file_path, max_rows=None):
+    blocks = []
+    rows = 0
+    for block in pipeline.iter_csv_blocks(csv_file_path):
+        blocks.append(block)
+        rows += block.num_rows
+        if max_rows and rows >= max_rows:
+            break
+    table = pa.concat_tables(blocks).unify_dictionaries().combine_chunks()
+    return table.slice(0, max_rows) if max_rows else table
+
+# Function to turn a codec[:level] spec into writer options
+def parse_codec(spec):
+    codec, _, level = spec.partition(':')
+    return {'compression': codec, 'compression_level': int(level) if level else None}
+
+# Function to time the best of several calls
+def best_seconds(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# Function to write a table with one layout and measure it
+def measure_layout(table, name, profile, subset_columns, repeats, work_directory):
+    file_path = os.path.join(work_directory, 'layout.parquet')
+    start = time.perf_counter()
+    pq.write_table(table, file_path, row_group_size=profile['row_group_rows'], **pipeline.parquet_write_options(profile))
+    write_seconds = time.perf_counter() - start
+
+    measurement = {
+        'layout': name,
+        **profile,
+        'write_seconds': write_seconds,
+        'read_seconds': best_seconds(lambda: pq.read_table(file_path), repeats),
+        'subset_read_seconds': best_seconds(lambda: pq.read_table(file_path, columns=subset_columns), repeats),
+        'size_mb': os.path.getsize(file_path) / 1024 ** 2,
+    }
+    os.remove(file_path)
+    return measurement
+
+def print_measurements(measurements, rows):
+    print(f"\n{rows:,} rows, sorted by full read time\n")
+    print(f"{'layout':<34}{'write s':>9}{'read s':>9}{'subset s':>10}{'size MB':>10}")
+    for item in sorted(measurements, key=lambda item: item['read_seconds']):
+        print(f"{item['layout']:<34}{item['write_seconds']:>9.2f}{item['read_seconds']:>9.3f}"
+              f"{item['subset_read_seconds']:>10.3f}{item['size_mb']:>10.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare parquet codecs, dictionary encoding and row group sizes on one csv.")
+    parser.add_argument('csv', help="generated csv to convert")
+    parser.add_argument('--codecs', nargs='+', default=DEFAULT_CODECS, help="codec[:level] specs, e.g. zstd:3")
+    parser.add_argument('--dictionary', nargs='+', choices=['on', 'off'], default=['on', 'off'], help="dictionary encoding settings")
+    parser.add_argument('--row-group-rows', type=int, nargs='+', default=DEFAULT_ROW_GROUP_ROWS, help="row group sizes")
+    parser.add_argument('--profiles', nargs='*', choices=pipeline.PARQUET_PROFILES, default=list(pipeline.PARQUET_PROFILES),
+                        help="pinned pipeline profiles to measure as well")
+    parser.add_argument('--subset-columns', nargs='+', default=DEFAULT_SUBSET_COLUMNS, help="columns of the subset read")
+    parser.add_argument('--max-rows', type=int, default=None, help="only use the first N rows of the csv")
+    parser.add_argument('--repeats', type=int, default=3, help="reads per layout, the best is reported")
+    parser.add_argument('--output', default=None, help="results json file")
+    args = parser.parse_args()
+
+    table = read_source(args.csv, args.max_rows)
+
+    layouts = {}
+    for profile_name in args.profiles:
+        layouts[f"profile {profile_name}"] = pipeline.PARQUET_PROFILES[profile_name]
+    for codec in args.codecs:
+        for dictionary in args.dictionary:
+            for row_group_rows in args.row_group_rows:
+                layouts[f"{codec} dict={dictionary} rg={row_group_rows:,}"] = {
+                    **parse_codec(codec), 'use_dictionary': dictionary == 'on', 'row_group_rows': row_group_rows,
+                }
+
+    measurements = []
+    with tempfile.TemporaryDirectory(prefix='parquet_layouts_') as work_directory:
+        for name, profile in layouts.items():
+            print(f"Measuring {name}")
+            measurements.append(measure_layout(table, name, profile, args.subset_columns, args.repeats, work_directory))
+
+    print_measurements(measurements, table.num_rows)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'csv': args.csv, 'rows': table.num_rows, 'measurements': measurements}, file, indent=2)
+        print(f"\nWrote results to {args.output}\n")
@@ -1,109 +1,404 @@
+import time
+
+# launch time of the app, taken before the heavy imports, to track its time to first request (see /health)
+started_at = time.time()
+
+import hashlib
+import json
 import os
-import pandas as pd
+import threading
+import pyarrow as pa
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output, State
-import plotly.express as px
 import dash_bootstrap_components as dbc
+from flask import has_request_context, jsonify, request
+from result_cache import ResultCache
+from sales_store import COLUMNS, DIMENSIONS, load_store, read_store_meta
+
+# pandas (which pyarrow.dataset imports too) and plotly express take about half a second to import and nothing
+# needs them before the data is loaded or a chart is drawn, so they are imported where they are used (the data watcher imports them in the background
+# as the server starts) and the server answers requests without waiting for them
 
 # initialize dash app with bootstrap theme
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
-# load parquet file into pandas dataframe
-parquet_file_path = os.path.join(os.path.dirname(__file__), 'data', 'sales_data.parquet')
-df = pd.read_parquet(parquet_file_path)
-
-# make sure dates are datetime ojbects
-df['date'] = pd.to_datetime(df['date'])
-
-# pre-compute data for performance
-total_net_sales = df['net_sales'].sum()
-net_sales_by_category = df.groupby('category')['net_sales'].sum().reset_index()
-net_sales_by_location = df.groupby('location')['net_sales'].sum().reset_index()
-top_25_menu_items = df.groupby('menu_item')['net_sales'].sum().reset_index().sort_values(by='net_sales', ascending=False).head(25)
-
-# define app layout using dash bootstrap rows / columns / components
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col(html.H1("Restaurant Sales Dashboard", className="text-center text-primary mb-4"), width=12)
-    ]),
-
-    dbc.Row([
-        dbc.Col([
-            html.H4("Region Slicer"),
-            dcc.Dropdown(
-                id='region-slicer',
-                options=[{'label': region, 'value': region} for region in df['region'].unique()],
-                placeholder="Select a Region",
-            ),
-        ], width=3),
-
-        dbc.Col([
-            html.H4("Location Slicer"),
-            dcc.Dropdown(
-                id='location-slicer',
-                options=[{'label': location, 'value': location} for location in df['location'].unique()],
-                placeholder="Select a Location",
-                multi=True
-            ),
-        ], width=3),
-
-        dbc.Col([
-            html.H4("Date Range Slicer"),
-            dcc.DatePickerRange(
-                id='date-range-slicer',
-                min_date_allowed=df['date'].min(),
-                max_date_allowed=df['date'].max(),
-                start_date=df['date'].min(),
-                end_date=df['date'].max()
-            ),
-        ], width=6),
-    ]),
-
-    dbc.Row([
-        dbc.Col([
-            html.H4("Menu Category Slicer"),
-            dcc.Dropdown(
-                id='category-slicer',
-                options=[{'label': category, 'value': category} for category in df['category'].unique()],
-                placeholder="Select a Menu Category",
-            ),
-        ], width=4),
-
-        dbc.Col([
-            html.H4("Menu Item Slicer"),
-            dcc.Dropdown(
-                id='menu-item-slicer',
-                options=[{'label': item, 'value': item} for item in df['menu_item'].unique()],
-                placeholder="Select a Menu Item",
-                multi=True
-            ),
-        ], width=4),
-    ]),
-
-    dbc.Row([
-        dbc.Col([
-            html.Div(
-                id='total-net-sales-display', 
-                className='card card-body bg-light mb-3',
-                style={'fontSize': '32px', 'fontWeight': 'bold', 'textAlign': 'center'}
-            ),
-        ], width=12),
-    ]),
-
-    dbc.Row([
-        dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-region-bar')), width=6),
-        dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-location-bar')), width=6),
-    ]),
-
-    dbc.Row([
-        dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-category-bar')), width=6),
-        dbc.Col(dcc.Loading(dcc.Graph(id='net-sales-by-item-bar-top-25')), width=6),
-    ]),
-])
+# WSGI entry point for production servers: gunicorn --config gunicorn.conf.py app:server (see gunicorn.conf.py)
+server = app.server
+
+# load parquet data into pandas dataframe
+APP_DATA_DIRECTORY = os.environ.get('APP_DATA_DIRECTORY', os.path.join(os.path.dirname(__file__), 'data'))
+parquet_file_path = os.path.join(APP_DATA_DIRECTORY, 'sales_data.parquet')
+# partitioned dataset written by sales_data_pipeline.py --layout partitioned, preferred when it exists
+dataset_directory = os.path.join(APP_DATA_DIRECTORY, 'sales_data')
+# uncompressed arrow ipc snapshot written by sales_data_pipeline.py, preferred over both
+snapshot_file_path = os.path.join(APP_DATA_DIRECTORY, 'sales_data.arrow')
+
+# memory-mapped working data, built once per data version and shared by every server process (see sales_store.py)
+APP_STORE_DIRECTORY = os.environ.get('APP_STORE_DIRECTORY', os.path.join(APP_DATA_DIRECTORY, 'serving_store'))
+
+# optional slice of the data to load, e.g. APP_START_DATE=2024-01-01 APP_REGIONS=Southeast,West
+APP_START_DATE = os.environ.get('APP_START_DATE')
+APP_END_DATE = os.environ.get('APP_END_DATE')
+APP_REGIONS = [region for region in os.environ.get('APP_REGIONS', '').split(',') if region]
+
+# size of the cache of aggregated results per slicer state, e.g. RESULT_CACHE_ENTRIES=1024 RESULT_CACHE_MB=128
+RESULT_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', 256))
+RESULT_CACHE_MB = float(os.environ.get('RESULT_CACHE_MB', 64))
+
+# how often every server process checks for a new version of the data, in seconds (0 turns the watcher off),
+# e.g. APP_RELOAD_SECONDS=300
+APP_RELOAD_SECONDS = float(os.environ.get('APP_RELOAD_SECONDS', 30))
+
+# Function to build a filter on region and date range, and for the partitioned dataset on its year and month partitions
+# (mirrors dataset_filter in data_pipeline/sales_data_pipeline.py, the app is deployed without the pipeline)
+def dataset_filter(start_date=None, end_date=None, regions=None, partitioned=True):
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    expression = ds.scalar(True)
+    if regions:
+        expression = expression & ds.field('region').isin(regions)
+    if start_date:
+        start_date = pd.Timestamp(start_date)
+        if partitioned:
+            expression = expression & ((ds.field('year') > start_date.year) | ((ds.field('year') == start_date.year) & (ds.field('month') >= start_date.month)))
+        expression = expression & (ds.field('date') >= pa.scalar(start_date.date(), type=pa.date32()))
+    if end_date:
+        end_date = pd.Timestamp(end_date)
+        if partitioned:
+            expression = expression & ((ds.field('year') < end_date.year) | ((ds.field('year') == end_date.year) & (ds.field('month') <= end_date.month)))
+        expression = expression & (ds.field('date') <= pa.scalar(end_date.date(), type=pa.date32()))
+    return expression
+
+# Function to load the sales data as an arrow table, reading only the columns the store is built from (COLUMNS)
+# and the configured slice. the snapshot is memory-mapped: nothing is decoded, and processes reading it share the
+# same page cache
+def load_sales_table():
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    sliced = APP_START_DATE or APP_END_DATE or APP_REGIONS
+    if os.path.exists(snapshot_file_path):
+        table = pa.ipc.open_file(pa.memory_map(snapshot_file_path)).read_all().select(COLUMNS)
+        return table.filter(dataset_filter(APP_START_DATE, APP_END_DATE, APP_REGIONS, partitioned=False)) if sliced else table
+    if os.path.isdir(dataset_directory):
+        dataset = ds.dataset(dataset_directory, format='parquet', partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+        return dataset.to_table(columns=COLUMNS, filter=dataset_filter(APP_START_DATE, APP_END_DATE, APP_REGIONS))
+    return pq.read_table(parquet_file_path, columns=COLUMNS, read_dictionary=DIMENSIONS)
+
+# Function to identify the version of the data load_sales_table() reads: the raw data version the pipeline stamps on
+# the snapshot, a hash of the partitioned dataset's manifest, or the size and modification time of the parquet file
+def data_version():
+    if os.path.exists(snapshot_file_path):
+        metadata = pa.ipc.open_file(pa.memory_map(snapshot_file_path)).schema.metadata or {}
+        if b'source_version' in metadata:
+            return metadata[b'source_version'].decode()
+        stat = os.stat(snapshot_file_path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    if os.path.isdir(dataset_directory):
+        manifest_file_path = os.path.join(dataset_directory, '_manifest.json')
+        if os.path.exists(manifest_file_path):
+            with open(manifest_file_path, 'rb') as file:
+                return hashlib.sha256(file.read()).hexdigest()[:16]
+        # a dataset written without a manifest: the sizes and modification times of its files
+        stats = sorted((os.path.relpath(os.path.join(root, file_name), dataset_directory), os.path.getsize(os.path.join(root, file_name)),
+                        os.stat(os.path.join(root, file_name)).st_mtime_ns)
+                       for root, _, files in os.walk(dataset_directory) for file_name in files if file_name.endswith('.parquet'))
+        return hashlib.sha256(json.dumps(stats).encode()).hexdigest()[:16]
+    stat = os.stat(parquet_file_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+# Function to name the store of the data version and the configured slice
+def store_version():
+    version = data_version()
+    if APP_START_DATE or APP_END_DATE or APP_REGIONS:
+        version += '-' + hashlib.sha256(json.dumps([APP_START_DATE, APP_END_DATE, sorted(APP_REGIONS)]).encode()).hexdigest()[:8]
+    return version
+
+# the working data, mapped (or built, when no process has for this version yet) in the background once the server
+# starts, or by the first request that needs it (see current_store). store is replaced as a whole when the data
+# watcher loads a new version (see reload_store)
+store = None
+store_lock = threading.Lock()
+
+# time to the first request and to the data being ready, in seconds from launch
+startup_status = {
+    'started_at': started_at,
+    'first_request_seconds': None,
+    'ready_seconds': None,
+}
+
+# Function to return the store being served, mapping (or building) it first if it is not loaded yet. requests that
+# need it while it loads wait for it
+def current_store():
+    global store
+    if store is None:
+        with store_lock:
+            if store is None:
+                loaded_store = load_store(APP_STORE_DIRECTORY, store_version(), load_sales_table)
+                result_cache.set_version(loaded_store.version)
+                store = loaded_store
+                reload_status['loaded_at'] = time.time()
+                startup_status['ready_seconds'] = reload_status['loaded_at'] - started_at
+    return store
+
+# Function to read the slicer options and date bounds of the layout without waiting for the store: from the store
+# once it is loaded, from its meta.json once it is built, or from the metadata of the snapshot (the values its rows
+# use, written by the pipeline) when the whole snapshot is loaded. dates are iso strings, so drawing the layout
+# needs no pandas. None while none of them is available
+def layout_metadata():
+    store_snapshot = store
+    if store_snapshot is not None:
+        return {
+            'values': store_snapshot.values,
+            'first_date': store_snapshot.first_date.date().isoformat() if store_snapshot.first_date is not None else None,
+            'last_date': store_snapshot.last_date.date().isoformat() if store_snapshot.last_date is not None else None,
+        }
+    meta = read_store_meta(APP_STORE_DIRECTORY, store_version())
+    if meta is None and os.path.exists(snapshot_file_path) and not (APP_START_DATE or APP_END_DATE or APP_REGIONS):
+        metadata = pa.ipc.open_file(pa.memory_map(snapshot_file_path)).schema.metadata or {}
+        if b'values' in metadata:
+            meta = {'values': json.loads(metadata[b'values']), 'first_date': metadata[b'first_date'].decode() or None, 'last_date': metadata[b'last_date'].decode() or None}
+    if meta is None:
+        return None
+    return {'values': meta['values'], 'first_date': meta['first_date'], 'last_date': meta['last_date']}
+
+# Function to build the app layout using dash bootstrap rows / columns / components, on every page load, so the
+# slicer options and date bounds follow the data after a reload. when nothing tells the slicer values yet (no built
+# store and no unsliced snapshot), the layout a page loads waits for the store. dash also builds the layout to
+# validate it on the first request of any kind, including health checks, which must not wait: that copy is never
+# shown, so it gets empty slicers
+def serve_layout():
+    metadata = layout_metadata()
+    if metadata is None and has_request_context() and request.path.endswith('_dash-layout'):
+        current_store()
+        metadata = layout_metadata()
+    metadata = metadata or {'values': {column: [] for column in DIMENSIONS}, 'first_date': None, 'last_date': None}
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.H1("Restaurant Sales Dashboard", className="text-center text-primary mb-4"), width=12)
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                html.H4("Region Slicer"),
+                dcc.Dropdown(
+                    id='region-slicer',
+                    options=[{'label': region, 'value': region} for region in metadata['values']['region']],
+                    placeholder="Select a Region",
+                ),
+            ], width=3),
+
+            dbc.Col([
+                html.H4("Location Slicer"),
+                dcc.Dropdown(
+                    id='location-slicer',
+                    options=[{'label': location, 'value': location} for location in metadata['values']['location']],
+                    placeholder="Select a Location",
+                    multi=True
+                ),
+            ], width=3),
+
+            dbc.Col([
+                html.H4("Date Range Slicer"),
+                dcc.DatePickerRange(
+                    id='date-range-slicer',
+                    min_date_allowed=metadata['first_date'],
+                    max_date_allowed=metadata['last_date'],
+                    start_date=metadata['first_date'],
+                    end_date=metadata['last_date']
+                ),
+            ], width=6),
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                html.H4("Menu Category Slicer"),
+                dcc.Dropdown(
+                    id='category-slicer',
+                    options=[{'label': category, 'value': category} for category in metadata['values']['category']],
+                    placeholder="Select a Menu Category",
+                ),
+            ], width=4),
+
+            dbc.Col([
+                html.H4("Menu Item Slicer"),
+                dcc.Dropdown(
+                    id='menu-item-slicer',
+                    options=[{'label': item, 'value': item} for item in metadata['values']['menu_item']],
+                    placeholder="Select a Menu Item",
+                    multi=True
+                ),
+            ], width=4),
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                html.Div(
+                    id='total-net-sales-display', 
+                    className='card card-body bg-light mb-3',
+                    style={'fontSize': '32px', 'fontWeight': 'bold', 'textAlign': 'center'}
+                ),
+            ], width=12),
+        ]),
+
+        dbc.Row([
+            dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-region-bar')), width=6),
+            dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-location-bar')), width=6),
+        ]),
+
+        dbc.Row([
+            dbc.Col(dcc.Loading(dcc.Graph(id='sales-by-category-bar')), width=6),
+            dbc.Col(dcc.Loading(dcc.Graph(id='net-sales-by-item-bar-top-25')), width=6),
+        ]),
+    ])
+
+app.layout = serve_layout
 
 # callbacks and functionality for responsive ui
 
+# shared filter evaluation: every callback fires on the same slicer change, so the rows each selection keeps are
+# computed once per slicer state (by the store) and the aggregated results are cached, instead of each callback
+# copying and masking the frame
+
+result_cache = ResultCache(max_entries=RESULT_CACHE_ENTRIES, max_bytes=int(RESULT_CACHE_MB * 1024 * 1024))
+
+# Function to turn the slicer values into a normalized, hashable selection key: multi-selects are sorted and
+# dates are whole days clamped to the data, so the same selection made in another order, no date selection and
+# the full date range all share a key
+def selection_key(store, selected_region, selected_location, start_date, end_date, selected_category=None, selected_menu_item=None):
+    import pandas as pd
+
+    # ensure default values on initial load
+    if not start_date or not end_date:
+        start_date, end_date = store.first_date, store.last_date
+    if store.first_date is not None:
+        start_date = max(pd.Timestamp(start_date).ceil('D'), store.first_date)
+        end_date = min(pd.Timestamp(end_date).floor('D'), store.last_date)
+    return (
+        selected_region or None,
+        tuple(sorted(set(selected_location))) if selected_location else None,
+        start_date,
+        end_date,
+        selected_category or None,
+        tuple(sorted(set(selected_menu_item))) if selected_menu_item else None,
+    )
+
+# Function to sum net sales of a selection by one slicer column, from the result cache when it was seen before
+def cached_net_sales_by(store, key, column):
+    return result_cache.get(('net_sales_by', column, key), store.version, lambda: store.net_sales_by(store.selected_rows(*key), column))
+
+# Function to total the net sales of a selection (None when it has no rows), from the result cache when it was seen before
+def cached_total_net_sales(store, key):
+    return result_cache.get(('total_net_sales', key), store.version, lambda: store.total_net_sales(store.selected_rows(*key)))
+
+# cache hits and misses, to size the result cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# hot reload: a watcher thread in every server process checks the data version every APP_RELOAD_SECONDS and loads
+# a new version off the request path (one process builds its store, the others wait for it and map it), then
+# swaps the store in one assignment. a request reads the store once and answers from it to the end, so requests
+# running during a swap finish on the old version, whose store is released once they are done
+reload_status = {
+    'loaded_at': None,
+    'reload_seconds': None,
+    'reloads': 0,
+    'checked_at': None,
+    'error': None,
+}
+watcher_process_id = None
+
+# Function to compute the results of the initial slicer state (nothing selected) into the result cache, so the
+# first page load after a reload is served from the cache
+def warm_result_cache(store_snapshot):
+    key = selection_key(store_snapshot, None, None, None, None)
+    cached_total_net_sales(store_snapshot, key)
+    for column in DIMENSIONS:
+        cached_net_sales_by(store_snapshot, key, column)
+
+# Function to load the current version of the data if it is not the one being served, returns whether it did
+def reload_store():
+    global store
+    version = store_version()
+    if version == current_store().version:
+        return False
+    start = time.perf_counter()
+    new_store = load_store(APP_STORE_DIRECTORY, version, load_sales_table)
+    # results of the old version are dropped; requests still answering from it compute without the cache
+    result_cache.set_version(new_store.version)
+    warm_result_cache(new_store)
+    store = new_store
+    reload_status.update(loaded_at=time.time(), reload_seconds=time.perf_counter() - start, reloads=reload_status['reloads'] + 1)
+    return True
+
+# Function to load the store off the request path as the server starts, then check for a new version of the data
+# every APP_RELOAD_SECONDS. a failed load or reload (e.g. a dataset written without a manifest, read while it is
+# being replaced) keeps the current store and is retried on the next check
+def watch_data():
+    # the callbacks draw with plotly express, imported now rather than by the first interaction
+    import plotly.express
+
+    while True:
+        try:
+            reload_store()
+            reload_status['error'] = None
+        except Exception as error:
+            reload_status['error'] = repr(error)
+        reload_status['checked_at'] = time.time()
+        if APP_RELOAD_SECONDS <= 0:
+            return
+        time.sleep(APP_RELOAD_SECONDS)
+
+# Function to start the data watcher of this process (once per process: threads do not survive the fork of
+# gunicorn workers, so gunicorn.conf.py starts it in every worker)
+def start_data_watcher():
+    global watcher_process_id
+    if watcher_process_id == os.getpid():
+        return
+    watcher_process_id = os.getpid()
+    threading.Thread(target=watch_data, name='data-watcher', daemon=True).start()
+
+# the version being served (None while the store loads), when it was loaded and how long the reload took
+@app.server.route('/data-status')
+def data_status():
+    store_snapshot = store
+    if store_snapshot is None:
+        return jsonify({'version': None, 'process_id': os.getpid(), 'reload_interval_seconds': APP_RELOAD_SECONDS, **reload_status})
+    return jsonify({
+        'version': store_snapshot.version,
+        'rows': store_snapshot.rows,
+        'first_date': store_snapshot.first_date.date().isoformat() if store_snapshot.first_date is not None else None,
+        'last_date': store_snapshot.last_date.date().isoformat() if store_snapshot.last_date is not None else None,
+        'store_build_seconds': store_snapshot.build_seconds,
+        'process_id': os.getpid(),
+        'reload_interval_seconds': APP_RELOAD_SECONDS,
+        **reload_status,
+    })
+
+# Function to record the time from launch to the first request this process answers
+@app.server.before_request
+def record_first_request():
+    if startup_status['first_request_seconds'] is None:
+        startup_status['first_request_seconds'] = time.time() - started_at
+
+# Function to make sure pandas and plotly express are imported before any request but the health check is answered:
+# dash encodes its responses with plotly's json encoder, which uses pandas whenever it is in sys.modules, so it must
+# not see it half imported by the data watcher (an import statement waits for an import in progress to finish)
+@app.server.before_request
+def import_data_libraries():
+    if request.path != '/health':
+        import pandas
+        import plotly.express
+
+# health check, answered as soon as the server runs (it never waits for the data): ready tells whether the store
+# is loaded, with the time to the first request and to the data being ready
+@app.server.route('/health')
+def health():
+    return jsonify({'status': 'ok', 'ready': store is not None, 'process_id': os.getpid(), **startup_status})
+
 # update total net sales single metric based on slicers
 @app.callback(
     Output('total-net-sales-display', 'children'),
@@ -115,33 +410,15 @@ app.layout = dbc.Container([
      Input('menu-item-slicer', 'value')]
 )
 def update_total_net_sales(selected_region, selected_location, start_date, end_date, selected_category, selected_menu_item):
-    filtered_df = df.copy()
-
-    # ensure default values on initial load
-    if not start_date or not end_date:
-        start_date, end_date = df['date'].min(), df['date'].max()
-
-    # apply filters
-    filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
-
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    
-    if selected_location:
-        filtered_df = filtered_df[filtered_df['location'].isin(selected_location)]
-    
-    if selected_category:
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
-
-    if selected_menu_item:
-        filtered_df = filtered_df[filtered_df['menu_item'].isin(selected_menu_item)]
+    # one store for the whole request, even if a reload swaps it meanwhile
+    store_snapshot = current_store()
+    total_sales = cached_total_net_sales(store_snapshot, selection_key(store_snapshot, selected_region, selected_location, start_date, end_date, selected_category, selected_menu_item))
 
     # make sure not empty
-    if filtered_df.empty:
+    if total_sales is None:
         return "No data available for the selected filters."
 
     # make metric
-    total_sales = filtered_df['net_sales'].sum()
     return f"Total Net Sales: ${total_sales:,.2f}"
 
 # update total net sales by category bar chart based on slicers
@@ -155,34 +432,16 @@ def update_total_net_sales(selected_region, selected_location, start_date, end_d
      Input('menu-item-slicer', 'value')]
 )
 def update_sales_by_category(selected_region, selected_location, start_date, end_date, selected_category, selected_menu_item):
-    filtered_df = df.copy()
-
-    # ensure default values on initial load
-    if not start_date or not end_date:
-        start_date, end_date = df['date'].min(), df['date'].max()
-
-    # apply filters
-    filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
+    store_snapshot = current_store()
+    import plotly.express as px
 
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    
-    if selected_location:
-        filtered_df = filtered_df[filtered_df['location'].isin(selected_location)]
-    
-    if selected_category:
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
-
-    if selected_menu_item:
-        filtered_df = filtered_df[filtered_df['menu_item'].isin(selected_menu_item)]
+    # group by category and sum net sales
+    sales_by_category = cached_net_sales_by(store_snapshot, selection_key(store_snapshot, selected_region, selected_location, start_date, end_date, selected_category, selected_menu_item), 'category')
 
     # make sure not empty
-    if filtered_df.empty:
+    if sales_by_category.empty:
         return px.bar(title="No Data Available")
 
-    # group by category and sum net sales
-    sales_by_category = filtered_df.groupby('category')['net_sales'].sum().reset_index()
-
     # make chart
     fig = px.bar(
         sales_by_category,
@@ -202,30 +461,16 @@ def update_sales_by_category(selected_region, selected_location, start_date, end
      Input('menu-item-slicer', 'value')]
 )
 def update_sales_by_region(selected_region, selected_location, start_date, end_date, selected_menu_item):
-    filtered_df = df.copy()
-
-    # ensure default values on initial load
-    if not start_date or not end_date:
-        start_date, end_date = df['date'].min(), df['date'].max()
-
-    # apply filters
-    filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
-
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    
-    if selected_location:
-        filtered_df = filtered_df[filtered_df['location'].isin(selected_location)]
+    # the category slicer does not apply to this chart
+    store_snapshot = current_store()
+    import plotly.express as px
 
-    if selected_menu_item:
-        filtered_df = filtered_df[filtered_df['menu_item'].isin(selected_menu_item)]
+    # group by region and sum net sales
+    sales_by_region = cached_net_sales_by(store_snapshot, selection_key(store_snapshot, selected_region, selected_location, start_date, end_date, selected_menu_item=selected_menu_item), 'region')
 
     # make sure not empty
-    if filtered_df.empty:
+    if sales_by_region.empty:
         return px.bar(title="No Data Available")
-    
-    # group by region and sum net sales
-    sales_by_region = filtered_df.groupby('region')['net_sales'].sum().reset_index()
 
     # create the chart
     fig = px.bar(
@@ -249,26 +494,17 @@ def update_sales_by_region(selected_region, selected_location, start_date, end_d
      Input('date-range-slicer', 'end_date')]
 )
 def update_top_25_menu_items(selected_region, selected_location, start_date, end_date):
-    filtered_df = df.copy()
-
-    # ensure default values on initial load
-    if not start_date or not end_date:
-        start_date, end_date = df['date'].min(), df['date'].max()
-
-    # apply filters
-    filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
+    # the category and menu item slicers do not apply to this chart
+    store_snapshot = current_store()
+    import plotly.express as px
 
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    
-    if selected_location:
-        filtered_df = filtered_df[filtered_df['location'].isin(selected_location)]
+    # group by menu item and sum net sales
+    sales_by_menu_item = cached_net_sales_by(store_snapshot, selection_key(store_snapshot, selected_region, selected_location, start_date, end_date), 'menu_item')
 
-    if filtered_df.empty:
+    if sales_by_menu_item.empty:
         return px.bar(title="No Data Available")
-    
-    # group by menu item and sum net sales
-    top_25_items = filtered_df.groupby('menu_item')['net_sales'].sum().reset_index().sort_values(by='net_sales', ascending=False).head(25)
+
+    top_25_items = sales_by_menu_item.sort_values(by='net_sales', ascending=False).head(25)
 
     # make the bar chart
     fig = px.bar(
@@ -293,31 +529,17 @@ def update_top_25_menu_items(selected_region, selected_location, start_date, end
      Input('menu-item-slicer', 'value')]
 )
 def update_sales_by_location(selected_region, selected_location, start_date, end_date, selected_menu_item):
-    filtered_df = df.copy()
-
-    # ensure default values on initial load
-    if not start_date or not end_date:
-        start_date, end_date = df['date'].min(), df['date'].max()
+    # the category slicer does not apply to this chart
+    store_snapshot = current_store()
+    import plotly.express as px
 
-    # apply filters
-    filtered_df = filtered_df[(filtered_df['date'] >= start_date) & (filtered_df['date'] <= end_date)]
-
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-    
-    if selected_location:
-        filtered_df = filtered_df[filtered_df['location'].isin(selected_location)]
-
-    if selected_menu_item:
-        filtered_df = filtered_df[filtered_df['menu_item'].isin(selected_menu_item)]
+    # group by location and sum net sales
+    sales_by_location = cached_net_sales_by(store_snapshot, selection_key(store_snapshot, selected_region, selected_location, start_date, end_date, selected_menu_item=selected_menu_item), 'location')
 
     # make sure not empty
-    if filtered_df.empty:
+    if sales_by_location.empty:
         return px.bar(title="No Data Available")
 
-    # group by location and sum net sales
-    sales_by_location = filtered_df.groupby('location')['net_sales'].sum().reset_index()
-
     # make the bar chart
     fig = px.bar(
         sales_by_location,
@@ -337,4 +559,5 @@ if __name__ == '__main__':
     # app.run_server(debug=True, host="0.0.0.0", port=8050)
     # dynamic port binding for render with default 8050 if not specified
     port = int(os.environ.get("PORT", 8050))
+    start_data_watcher()
     app.run_server(host='0.0.0.0', port=port)
@@ -0,0 +1,34 @@
+'''
+# gunicorn.conf.py
+
+goals:
+- serve the dashboard with several worker processes that share one copy of its data
+
+functionality:
+- app.py is imported once in the master (preload_app) before the workers are forked. the import is quick: it does
+  not load the data, so the workers answer health checks right after they start
+- every worker maps the same store (the first to start builds it if needed, the others wait for it): the data sits
+  in the page cache once, not once per worker
+- binds 0.0.0.0:$PORT (default 8050), with WEB_CONCURRENCY workers (default one per cpu) of GUNICORN_THREADS
+  threads each (default 1)
+- starts the data watcher of app.py in every worker once it is forked (threads started in the master do not
+  survive the fork), which maps the store in the background and then picks up new versions of the data
+  (APP_RELOAD_SECONDS)
+
+usage:
+- cd dash_app && gunicorn --config gunicorn.conf.py app:server (the Docker image runs this)
+'''
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8050)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+timeout = 120
+
+# Function to start the data watcher of a worker once it has loaded the app
+def post_worker_init(worker):
+    import app
+    app.start_data_watcher()
@@ -0,0 +1,110 @@
+'''
+# result_cache.py
+
+goals:
+- keep the aggregated results of recent slicer states in memory, so flipping back to a selection seen before
+  skips the filtering and grouping of every callback
+
+functionality:
+- entries are keyed by the caller (app.py uses the result name and the normalized slicer state) and hold
+  aggregated results (small dataframes and totals), never figures. cached results are shared: treat them as read-only
+- the least recently used entries are evicted once there are more than max_entries of them or their estimated
+  size exceeds max_bytes (a single result larger than max_bytes is returned without being cached)
+- every lookup names the version of the data it is computed from. set_version() switches the cache to a new version
+  and drops the results of the old one, so results of a replaced dataset are never served. lookups naming another
+  version than the current one (requests still running on the data a reload replaced) are computed without being
+  cached, so they neither get nor evict results of the current version
+- results are computed outside the lock, so a slow computation does not hold up lookups of other keys
+- hits, misses, evictions and invalidations are counted, and stats() reports them with the hit rate, the entries
+  and the bytes held, to size the cache
+
+usage:
+- used by dash_app/app.py, sized with the RESULT_CACHE_ENTRIES and RESULT_CACHE_MB environment variables,
+  stats served at /cache-stats
+'''
+
+import sys
+import threading
+from collections import OrderedDict
+
+# Function to estimate the memory held by a cached result
+def result_size(value):
+    # imported here, so importing the cache does not import pandas (see app.py)
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return sys.getsizeof(value)
+
+class ResultCache:
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Function to switch the cache to a new version of the data, dropping the results of the old one
+    def set_version(self, version):
+        with self.lock:
+            if version == self.version:
+                return
+            if self.entries:
+                self.invalidations += 1
+            self._clear()
+            self.version = version
+
+    # Function to return the cached result of a key, or compute and cache it
+    def get(self, key, version, compute):
+        with self.lock:
+            if version == self.version and key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = result_size(value)
+
+        with self.lock:
+            # a lookup of a version the cache does not hold (or the data was replaced while computing), or the
+            # result alone would fill the cache
+            if version != self.version or size > self.max_bytes or key in self.entries:
+                return value
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def _clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
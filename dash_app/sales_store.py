@@ -0,0 +1,215 @@
+'''
+# sales_store.py
+
+goals:
+- hold the dashboard's working data in memory-mapped files that every server process maps read-only, so the data
+  sits in memory once however many workers serve the app
+
+functionality:
+- a store is a directory of .npy arrays built once from the sales rows the app loads:
+    - <dimension>_codes: the code of every row in region, location, category and menu_item
+    - <dimension>_positions and <dimension>_ends: the inverted index, the row positions of every code (sorted) and
+      where each code's positions end
+    - net_sales: the net sales of every row
+    - day_offsets: the first row of every day, from the first date to the day after the last
+    - meta.json: rows, date bounds, the lookup table of every dimension and the values the rows use
+- rows are sorted by date, so a date range is a contiguous slice of rows
+- stores are named by the version of the data (and the configured slice) and built under a file lock: the first
+  process builds the store, the others wait for it and map what it built. a store is built in a work directory
+  and renamed into place, so it is complete once it exists. stores of other versions are removed
+- meta.json doubles as a sidecar: read_store_meta() reads the slicer values and date bounds of a built store without
+  mapping it
+- SalesStore maps a store with np.load(mmap_mode='r'), so the arrays are shared through the page cache and nothing
+  is copied into the process, and resolves slicer selections and aggregates on them (pandas is imported once a
+  store is mapped, not with the module, so the app starts without it):
+    - a selection is a slice of rows (a date range) or a sorted array of row positions, and costs what it keeps
+    - selections are kept in a small lru cache of the store, which goes away with the store
+
+usage:
+- used by dash_app/app.py, which builds and maps its store in APP_STORE_DIRECTORY (APP_DATA_DIRECTORY/serving_store)
+'''
+
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+import numpy as np
+import pyarrow as pa
+
+# slicer columns, held as codes with an inverted index of the rows of every value
+DIMENSIONS = ['region', 'location', 'category', 'menu_item']
+
+# columns a store is built from, the only ones the app reads
+COLUMNS = DIMENSIONS + ['date', 'net_sales']
+
+# slicer states whose row selections are kept in memory, each holds a few arrays of up to four bytes per row
+SELECTION_CACHE_SIZE = 8
+
+META_FILE_NAME = 'meta.json'
+LOCK_FILE_NAME = '.lock'
+BUILD_DIRECTORY_PREFIX = '.build-'
+
+# Function to write the store of an arrow table of sales rows (dictionary-encoded dimensions, date32 dates) to a directory
+def build_store(table, store_directory, version):
+    start = time.perf_counter()
+    table = table.select(COLUMNS).unify_dictionaries()
+    days = table.column('date').combine_chunks().cast(pa.int32()).to_numpy(zero_copy_only=False)
+
+    # keep the rows sorted by date, so every date range is one contiguous run of rows (the snapshot already is)
+    order = np.argsort(days, kind='stable') if np.any(np.diff(days) < 0) else None
+    if order is not None:
+        days = days[order]
+
+    work_directory = tempfile.mkdtemp(prefix=BUILD_DIRECTORY_PREFIX, dir=os.path.dirname(store_directory))
+    try:
+        meta = {'version': version, 'rows': len(days), 'categories': {}, 'values': {}}
+        for column in DIMENSIONS:
+            array = table.column(column).combine_chunks()
+            codes = array.indices.to_numpy(zero_copy_only=False)
+            codes = codes[order] if order is not None else codes
+            categories = array.dictionary.to_pylist()
+            # inverted index: row positions ordered by code, and where the positions of each code end
+            counts = np.bincount(codes, minlength=len(categories))
+            np.save(os.path.join(work_directory, f"{column}_codes.npy"), codes)
+            np.save(os.path.join(work_directory, f"{column}_positions.npy"), np.argsort(codes, kind='stable').astype(np.int32))
+            np.save(os.path.join(work_directory, f"{column}_ends.npy"), np.cumsum(counts))
+            meta['categories'][column] = categories
+            meta['values'][column] = [value for value, count in zip(categories, counts) if count]
+
+        net_sales = table.column('net_sales').combine_chunks().to_numpy(zero_copy_only=False)
+        np.save(os.path.join(work_directory, 'net_sales.npy'), net_sales[order] if order is not None else net_sales)
+
+        if len(days):
+            meta['first_date'] = str(np.datetime64(int(days[0]), 'D'))
+            meta['last_date'] = str(np.datetime64(int(days[-1]), 'D'))
+            day_offsets = np.searchsorted(days, np.arange(days[0], days[-1] + 2))
+        else:
+            meta['first_date'] = meta['last_date'] = None
+            day_offsets = np.zeros(1, dtype=np.int64)
+        np.save(os.path.join(work_directory, 'day_offsets.npy'), day_offsets)
+
+        meta['build_seconds'] = time.perf_counter() - start
+        with open(os.path.join(work_directory, META_FILE_NAME), 'w') as file:
+            json.dump(meta, file)
+        os.rename(work_directory, store_directory)
+    except BaseException:
+        shutil.rmtree(work_directory, ignore_errors=True)
+        raise
+
+# Function to read the metadata of the store of a version (rows, date bounds and the values of every dimension),
+# or None if it is not built yet
+def read_store_meta(store_root, version):
+    meta_file_path = os.path.join(store_root, version, META_FILE_NAME)
+    if not os.path.exists(meta_file_path):
+        return None
+    with open(meta_file_path) as file:
+        return json.load(file)
+
+# Function to map the store of a version, building it first (from load_table()) if no process has yet.
+# stores of other versions are removed: processes still mapping them keep their mappings until they let go
+def load_store(store_root, version, load_table):
+    store_directory = os.path.join(store_root, version)
+    os.makedirs(store_root, exist_ok=True)
+    with open(os.path.join(store_root, LOCK_FILE_NAME), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if not os.path.isdir(store_directory):
+            build_store(load_table(), store_directory, version)
+        for file_name in os.listdir(store_root):
+            if file_name not in (version, LOCK_FILE_NAME):
+                shutil.rmtree(os.path.join(store_root, file_name), ignore_errors=True)
+    return SalesStore(store_directory)
+
+class SalesStore:
+    def __init__(self, store_directory):
+        import pandas as pd
+
+        with open(os.path.join(store_directory, META_FILE_NAME)) as file:
+            meta = json.load(file)
+        self.directory = store_directory
+        self.version = meta['version']
+        self.rows = meta['rows']
+        self.build_seconds = meta['build_seconds']
+        self.values = meta['values']
+        self.categories = {column: np.array(meta['categories'][column], dtype=object) for column in DIMENSIONS}
+        self.category_codes = {column: {value: code for code, value in enumerate(meta['categories'][column])} for column in DIMENSIONS}
+        self.first_date = pd.Timestamp(meta['first_date']) if meta['first_date'] else None
+        self.last_date = pd.Timestamp(meta['last_date']) if meta['last_date'] else None
+
+        def load(name):
+            return np.load(os.path.join(store_directory, f"{name}.npy"), mmap_mode='r')
+
+        self.codes = {column: load(f"{column}_codes") for column in DIMENSIONS}
+        self.row_index = {}
+        for column in DIMENSIONS:
+            positions, ends = load(f"{column}_positions"), np.asarray(load(f"{column}_ends"))
+            self.row_index[column] = [positions[end - count:end] for end, count in zip(ends, np.diff(ends, prepend=0))]
+        self.net_sales = load('net_sales')
+        self.day_offsets = np.asarray(load('day_offsets'))
+        self.first_day = np.datetime64(self.first_date, 'D') if self.first_date is not None else None
+        self.selected_rows = lru_cache(maxsize=SELECTION_CACHE_SIZE)(self.find_rows)
+
+    # Function to count the rows of a selection
+    def row_count(self, rows):
+        return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+    # Function to find the rows of a date range as a slice: the first day on or after start_date up to the last day
+    # on or before end_date, looked up in day_offsets
+    def date_range_rows(self, start_date, end_date):
+        if self.first_day is None:
+            return slice(0, 0)
+        start_day = (np.datetime64(start_date.ceil('D'), 'D') - self.first_day).astype(np.int64)
+        end_day = (np.datetime64(end_date.floor('D'), 'D') - self.first_day).astype(np.int64) + 1
+        start_day, end_day = np.clip([start_day, max(start_day, end_day)], 0, len(self.day_offsets) - 1)
+        return slice(int(self.day_offsets[start_day]), int(self.day_offsets[end_day]))
+
+    # Function to keep the rows of a selection whose column holds one of the selected values
+    def rows_with_values(self, rows, column, values):
+        codes = np.array([self.category_codes[column][value] for value in values if value in self.category_codes[column]], dtype=np.int64)
+        if isinstance(rows, slice):
+            # union of the index entries of the selected values inside the slice: the entries are sorted, so the part
+            # of each inside the slice is a view found by searchsorted
+            entries = [self.row_index[column][code] for code in codes]
+            entries = [entry[np.searchsorted(entry, rows.start):np.searchsorted(entry, rows.stop)] for entry in entries]
+            if len(entries) == 1:
+                return entries[0]
+            return np.sort(np.concatenate(entries + [np.empty(0, dtype=np.int32)]))
+        # intersect with an existing selection by looking the codes of its rows up in the selected values
+        selected = np.zeros(len(self.categories[column]), dtype=bool)
+        selected[codes] = True
+        return rows[selected[self.codes[column][rows]]]
+
+    # Function to find the rows of a selection (through the selected_rows cache). a selection with a category narrows
+    # the same selection without it, which narrows the selection without menu items, so charts that ignore some
+    # slicers share the rows of the slicers they do use
+    def find_rows(self, selected_region, selected_location, start_date, end_date, selected_category=None, selected_menu_item=None):
+        if selected_category:
+            rows = self.selected_rows(selected_region, selected_location, start_date, end_date, None, selected_menu_item)
+            rows = self.rows_with_values(rows, 'category', [selected_category])
+        elif selected_menu_item:
+            rows = self.rows_with_values(self.selected_rows(selected_region, selected_location, start_date, end_date), 'menu_item', selected_menu_item)
+        else:
+            rows = self.date_range_rows(start_date, end_date)
+            if selected_location:
+                rows = self.rows_with_values(rows, 'location', selected_location)
+            if selected_region:
+                rows = self.rows_with_values(rows, 'region', [selected_region])
+        if not isinstance(rows, slice):
+            rows.flags.writeable = False
+        return rows
+
+    # Function to sum net sales of the selected rows by one slicer column, counting its codes with np.bincount
+    def net_sales_by(self, rows, column):
+        import pandas as pd
+
+        categories = self.categories[column]
+        codes = self.codes[column][rows]
+        net_sales = np.bincount(codes, weights=self.net_sales[rows], minlength=len(categories))
+        present = np.bincount(codes, minlength=len(categories)) > 0
+        return pd.DataFrame({column: categories[present], 'net_sales': net_sales[present].astype('int64')})
+
+    # Function to total the net sales of the selected rows (None when there are none)
+    def total_net_sales(self, rows):
+        return int(self.net_sales[rows].sum(dtype='int64')) if self.row_count(rows) else None
@@ -400,6 +400,54 @@ day_of_week_sales_volume_distribution = {
     "Sunday": .19,  
 }
 
+# share of a day's tickets that fall in each hour of the day (0 = midnight), open 11am to midnight
+hourly_sales_volume_distribution = {
+    0: .00,
+    1: .00,
+    2: .00,
+    3: .00,
+    4: .00,
+    5: .00,
+    6: .00,
+    7: .00,
+    8: .00,
+    9: .00,
+    10: .00,
+    11: .06,
+    12: .10,
+    13: .09,
+    14: .05,
+    15: .04,
+    16: .05,
+    17: .09,
+    18: .13,
+    19: .14,
+    20: .11,
+    21: .08,
+    22: .04,
+    23: .02,
+}
+
+# local time zone of each state with a location, used to place sales in the store's local hour and date
+state_time_zones = {
+    "California": "America/Los_Angeles",
+    "Colorado": "America/Denver",
+    "Florida": "America/New_York",
+    "Georgia": "America/New_York",
+    "Illinois": "America/Chicago",
+    "Louisiana": "America/Chicago",
+    "Massachusetts": "America/New_York",
+    "Michigan": "America/Detroit",
+    "Minnesota": "America/Chicago",
+    "Nevada": "America/Los_Angeles",
+    "New York": "America/New_York",
+    "Oregon": "America/Los_Angeles",
+    "Pennsylvania": "America/New_York",
+    "Tennessee": "America/Chicago",
+    "Texas": "America/Chicago",
+    "Washington": "America/Los_Angeles",
+}
+
 regional_menu_category_preference_distribution = {
     "Midwest": {
         "starters": 0.14,
@@ -5,7 +5,7 @@ goals:
 - generate a dataset of food sales for a theoretical restaurant chain
 
 functionality:
-- user sets a date range
+- user sets a date range (--start-date / --end-date, any number of years, defaults to 2023)
 - a dataset is generated with the following
 - dataset will include 1 aggregated row per each unique combination of: 
     - region
@@ -23,14 +23,69 @@ methodology:
     - monthly sales are further broken down into daily sales based on regional day-of-week sales volume distribution
     - daily sales are then distributed across menu categories based on regional menu category preference distribution
     - finally, sales are allocated semi-randomly to individual menu items within each category for each day until the daily sales target is met
-    
+- the first three steps are computed together as one location x day x category target matrix with numpy broadcasting
+- every calendar year in the date range gets the full projected annual sales, and a partial first or last month
+  only gets the share of its days that fall inside the range
+
+engines:
+- numpy (default): draws menu items and quantities in blocks per location / date / category and uses a cumulative sum 
+  to find the same "stop before exceeding the daily category target" cutoff as the reference loop
+- python: the original one-draw-at-a-time loop, kept as a reference for statistical comparison
+- both engines accept a seed so runs are reproducible
+
+parallel generation:
+- location-months are simulated independently, and every location-day draws from its own random stream, keyed by
+  the run seed, the store number and the date, so a day's data does not depend on which other days are generated in
+  the run: an --incremental run reproduces the days of a full run with the same seed
+- location-months can be spread across a process pool with --workers, and the output is identical for any worker count
+- workers return compact columnar batches instead of lists of dictionaries, which keeps the merge cheap
+
+record representation:
+- batches are dictionaries of typed numpy arrays (see sales_data_schema.py): int16 codes for region, location,
+  category and menu_item, int32 day numbers for date and int32 quantity_sold and net_sales
+- the codes become arrow dictionary arrays (parquet) or pandas categoricals (csv, run_simulation) only at output time
+
+aggregation:
+- by default every random draw becomes its own row, so the same menu item can appear several times per location per day
+- --aggregate sums the draws inside the engine to 1 row per location / date / category / menu_item (the grain described
+  in the README), and a report of the resulting row reduction is printed at the end of the run
+
+output:
+- location-month batches are streamed to the output file as they finish, so peak memory stays at a few batches
+  no matter how many locations or days are generated
+- --format parquet buffers batches into row groups of about ROW_GROUP_ROWS rows and writes them with a pyarrow ParquetWriter
+- --format csv (default) appends each batch to a csv file, which is what sales_data_pipeline.py picks up
+
+synthetic store portfolios:
+- --portfolio reads a store portfolio parquet file written by store_portfolio.py and simulates its stores
+  instead of the locations in restaurant_details.py, e.g. 1,000 or 10,000 stores for load testing
+
+incremental generation:
+- --incremental appends to a hive-style date-partitioned parquet dataset (--dataset-dir, year=YYYY/month=MM/part-*.parquet)
+- the last date already generated for each location is read from the newest partitions, and only the missing days
+  up to --end-date (default: yesterday) are simulated and written as new files next to the existing ones
+- locations with no data yet start at --start-date
+- files are written under a dot-prefixed temporary name and renamed when complete, so readers never see a partial
+  file (and skip one left behind by a crash), and every run names its files with a random id
+
+usage:
+- python data_pipeline/sales_data_creator.py --engine numpy --seed 42 --workers 8 --format parquet --aggregate
+- python data_pipeline/sales_data_creator.py --incremental --aggregate --seed 42
+- python data_pipeline/sales_data_creator.py --portfolio data_pipeline/generated_data/store_portfolio_10000.parquet --format parquet --aggregate
+
 
 '''
 
-import calendar
+import argparse
 import os
-import pandas as pd
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import starmap
+import numpy as np
+import pyarrow.parquet as pq
 import random
+import pyarrow.dataset as ds
 from datetime import datetime, timedelta
 from restaurant_details import (locations, 
                                 regional_monthly_seasonality_distribution, 
@@ -38,12 +93,34 @@ from restaurant_details import (locations,
                                 regional_menu_category_preference_distribution, 
                                 menu,
                                 )
+import sales_data_schema as schema
+from store_portfolio import load_portfolio
 
-# Initialize the final dataset to hold sales records
-sales_data = []
+# quantity sold per draw is a random integer in this inclusive range
+MIN_QUANTITY_PER_SALE = 1
+MAX_QUANTITY_PER_SALE = 5
 
-# Function to simulate sales per category per date
-def simulate_sales(location_name, region, date, category, daily_category_sales):
+# default date range of a run
+DEFAULT_START_DATE = '2023-01-01'
+DEFAULT_END_DATE = '2023-12-31'
+
+# default location of the date-partitioned dataset written by --incremental
+DEFAULT_DATASET_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generated_data', 'sales_data')
+
+# parquet sinks buffer batches until a row group holds about this many rows
+ROW_GROUP_ROWS = 1_000_000
+
+# the distributions as arrays, built once for the target matrix:
+# region x month (january first), weekday (monday first) and region x category
+MONTHLY_SEASONALITY = np.array([list(regional_monthly_seasonality_distribution[region].values()) for region in schema.REGION_NAMES])
+DAY_OF_WEEK_SALES_VOLUME = np.array(list(day_of_week_sales_volume_distribution.values()))
+MENU_CATEGORY_PREFERENCE = np.array([
+    [regional_menu_category_preference_distribution[region][category] for category in schema.CATEGORY_NAMES]
+    for region in schema.REGION_NAMES
+])
+
+# Function to simulate sales per category per date (reference engine, one draw at a time)
+def simulate_sales(location_name, region, date, category, daily_category_sales, rng=random):
     category_menu_items = menu[category]  # Get the menu items in this category
     
     total_sales = 0
@@ -52,11 +129,11 @@ def simulate_sales(location_name, region, date, category, daily_category_sales):
     # Randomly sell items until we exceed the forecasted category sales for the day
     while total_sales < daily_category_sales:
         # Randomly pick a menu item from the category
-        menu_item = random.choice(list(category_menu_items.keys()))
+        menu_item = rng.choice(list(category_menu_items.keys()))
         price = category_menu_items[menu_item]
         
         # Randomly decide how many of this item is sold (e.g., 1-5 items)
-        quantity_sold = random.randint(1, 5)
+        quantity_sold = rng.randint(MIN_QUANTITY_PER_SALE, MAX_QUANTITY_PER_SALE)
         item_sales = quantity_sold * price
         
         # Check if adding this sale would exceed the category's total sales for the day
@@ -78,91 +155,450 @@ def simulate_sales(location_name, region, date, category, daily_category_sales):
     
     return sales_records
 
-# Function to set daily sales totals per location
-def set_daily_sales_totals():
-    # Dictionary to store daily sales per category for each location
-    location_category_daily_sales = {}
-
-    # Iterate over each location to derive monthly sales totals
-    for location_name, location in locations.items():
-        region = location["region"]
-        projected_annual_sales = location["projected_annual_sales"]
-
-        # Initialize daily sales container for each location
-        location_category_daily_sales[location_name] = {}
-
-        # Retrieve the months directly from the regional_monthly_seasonality_distribution for this region
-        for month_name, seasonality_factor in regional_monthly_seasonality_distribution[region].items():
-            # Calculate monthly sales based on seasonality factor
-            monthly_sales = projected_annual_sales * seasonality_factor
-
-            # Calculate the start and end dates for the current month
-            month_start_date = datetime(2023, list(calendar.month_name).index(month_name), 1)
-            month_end_date = month_start_date.replace(day=calendar.monthrange(2023, month_start_date.month)[1])
-
-            # Count how many times each weekday appears in the current month
-            weekday_counts = {day: 0 for day in day_of_week_sales_volume_distribution.keys()}
-            current_date = month_start_date
-            while current_date <= month_end_date:
-                weekday = calendar.day_name[current_date.weekday()]
-                weekday_counts[weekday] += 1
-                current_date += timedelta(days=1)
-
-            # Calculate the total sales per weekday in the month
-            weekday_sales_totals = {}
-            for weekday, proportion in day_of_week_sales_volume_distribution.items():
-                weekday_sales_totals[weekday] = monthly_sales * proportion
-
-            # Now distribute the sales per weekday across the dates in the month
-            current_date = month_start_date
-            while current_date <= month_end_date:
-                weekday = calendar.day_name[current_date.weekday()]
-                # Sales for this specific day
-                daily_sales = weekday_sales_totals[weekday] / weekday_counts[weekday]
-                date_str = current_date.strftime("%Y-%m-%d")
-                
-                # Distribute daily sales into categories based on regional preferences
-                category_sales = {}
-                for category, category_proportion in regional_menu_category_preference_distribution[region].items():
-                    category_sales[category] = daily_sales * category_proportion
-                
-                # Store the category sales for that day
-                location_category_daily_sales[location_name][date_str] = category_sales
-                
-                current_date += timedelta(days=1)
-
-    return location_category_daily_sales
-
-# Main function to run the simulation
-def run_simulation():
-    # Step 1: Get daily sales totals per category
-    location_category_daily_sales = set_daily_sales_totals()
-
-    # Step 2: For each location, date, and category, simulate sales
-    for location_name, daily_sales_data in location_category_daily_sales.items():
-        region = locations[location_name]['region']
-        for date, category_sales in daily_sales_data.items():
-            for category, daily_category_sales in category_sales.items():
-                # Simulate the sales for this location, date, and category
-                category_sales_records = simulate_sales(location_name, region, date, category, daily_category_sales)
-                
-                # Append the sales records to the final dataset
-                sales_data.extend(category_sales_records)
-
-# Run the simulation
-run_simulation()
-
-# convert the sales_data list of dictionaries to a pandas DataFrame
-df_sales = pd.DataFrame(sales_data)
-
-print("\n--- Sales Data ---\n")
-print(df_sales.head())
-print(df_sales.info())
-
-# Save or display the results
-current_directory = os.path.dirname(__file__)
-# if it doesn't already exist, make a folder called "generated_data" within the current folder
-if not os.path.exists(f"{current_directory}/generated_data"):
-    os.makedirs(f"{current_directory}/generated_data")
-current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-df_sales.to_csv(f"{current_directory}/generated_data/sales_data_per_location_{current_datetime}.csv", index=False)
+# Function to simulate sales per category per date (numpy engine, draws in blocks)
+# returns the menu item codes and quantities of the kept draws
+def simulate_sales_vectorized(category, daily_category_sales, rng):
+    item_codes = schema.CATEGORY_MENU_ITEM_CODES[category]
+    item_prices = schema.CATEGORY_MENU_ITEM_PRICES[category]
+
+    # size each block so that one block usually covers the whole daily target
+    average_sale = item_prices.mean() * (MIN_QUANTITY_PER_SALE + MAX_QUANTITY_PER_SALE) / 2
+    block_size = int(daily_category_sales / average_sale * 1.1) + 16
+
+    total_sales = 0
+    item_blocks = []
+    quantity_blocks = []
+
+    while total_sales < daily_category_sales:
+        item_indexes = rng.integers(0, len(item_prices), size=block_size)
+        quantities = rng.integers(MIN_QUANTITY_PER_SALE, MAX_QUANTITY_PER_SALE + 1, size=block_size, dtype=schema.VALUE_DTYPE)
+        running_totals = total_sales + np.cumsum(item_prices[item_indexes] * quantities, dtype=np.int64)
+
+        # every sale is positive so the running total is strictly increasing, and the first draw that
+        # reaches the target is found with a binary search. the reference loop keeps a draw that lands
+        # exactly on the target and drops one that would exceed it
+        stop = np.searchsorted(running_totals, daily_category_sales, side='left')
+        if stop < block_size:
+            keep = stop + 1 if running_totals[stop] == daily_category_sales else stop
+            item_blocks.append(item_indexes[:keep])
+            quantity_blocks.append(quantities[:keep])
+            break
+
+        item_blocks.append(item_indexes)
+        quantity_blocks.append(quantities)
+        total_sales = running_totals[-1]
+
+    if not item_blocks:
+        return np.empty(0, dtype=schema.CODE_DTYPE), np.empty(0, dtype=schema.VALUE_DTYPE)
+
+    item_indexes = np.concatenate(item_blocks)
+    return item_codes[item_indexes], np.concatenate(quantity_blocks)
+
+# Function to set daily sales totals per location and category for every date in a range
+# returns the dates (datetime64[D]) and a location x date x category matrix of sales targets
+def set_daily_sales_totals(start_date, end_date, location_names=None):
+    if location_names is None:
+        location_names = list(locations.keys())
+
+    dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    months = dates.astype('datetime64[M]')
+    month_index = months.astype(np.int64) % 12
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a thursday
+
+    # count how many times each date's weekday appears in its calendar month: every weekday appears 4 times,
+    # plus once more for the first (days_in_month - 28) weekdays counted from the weekday of the 1st
+    month_start = months.astype('datetime64[D]')
+    days_in_month = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    month_start_weekday = (month_start.astype(np.int64) + 3) % 7
+    weekday_counts = 4 + ((weekday - month_start_weekday) % 7 < days_in_month - 28)
+
+    region_index = np.array([schema.REGION_CODES[locations[location_name]['region']] for location_name in location_names])
+    projected_annual_sales = np.array([locations[location_name]['projected_annual_sales'] for location_name in location_names], dtype=np.float64)
+
+    # annual -> monthly (seasonality) -> weekday totals (day-of-week) -> daily (weekday count) -> categories (preference)
+    monthly_sales = projected_annual_sales[:, None] * MONTHLY_SEASONALITY[region_index][:, month_index]
+    daily_sales = monthly_sales * DAY_OF_WEEK_SALES_VOLUME[weekday] / weekday_counts
+    category_sales = daily_sales[:, :, None] * MENU_CATEGORY_PREFERENCE[region_index][:, None, :]
+
+    return dates, category_sales
+
+# Function to simulate the stores of a portfolio file instead of the locations in restaurant_details.py.
+# also used as the process pool initializer, so workers started with the spawn method see the same portfolio
+def use_portfolio(portfolio_path):
+    global locations
+    locations = load_portfolio(portfolio_path)
+    schema.set_locations(locations)
+
+# Function to split a date range into months, clipping the first and last month to the range
+# returns a list of (first_day, last_day) datetime64[D] pairs
+def month_ranges(start_date, end_date):
+    start_date = np.datetime64(start_date, 'D')
+    end_date = np.datetime64(end_date, 'D')
+    if end_date < start_date:
+        raise ValueError(f"End date {end_date} is before start date {start_date}")
+
+    return [
+        (max(month.astype('datetime64[D]'), start_date), min((month + 1).astype('datetime64[D]') - 1, end_date))
+        for month in np.arange(start_date.astype('datetime64[M]'), end_date.astype('datetime64[M]') + 1)
+    ]
+
+# Function to yield the location-month tasks of a run as (location_name, first_day, last_day), in location then month
+# order (or month then location order with month_major). location_start_dates overrides the start date per location,
+# and locations that already start after the end date are skipped.
+# tasks are yielded one at a time, so nothing grows with the number of stores x months
+def iter_location_month_tasks(start_date, end_date, location_names, location_start_dates=None, month_major=False):
+    end_date = np.datetime64(end_date, 'D')
+    location_start_dates = {
+        location_name: np.datetime64((location_start_dates or {}).get(location_name, start_date), 'D')
+        for location_name in location_names
+    }
+    location_start_dates = {location_name: date for location_name, date in location_start_dates.items() if date <= end_date}
+    if not location_start_dates:
+        return
+
+    if not month_major:
+        for location_name, location_start_date in location_start_dates.items():
+            for first_day, last_day in month_ranges(location_start_date, end_date):
+                yield location_name, str(first_day), str(last_day)
+        return
+
+    # every month from the earliest start, with the locations that have started by its last day
+    for first_day, last_day in month_ranges(min(location_start_dates.values()), end_date):
+        for location_name, location_start_date in location_start_dates.items():
+            if location_start_date <= last_day:
+                yield location_name, str(max(first_day, location_start_date)), str(last_day)
+
+# Function to make the random stream of one location-day, keyed by the run seed, the store number and the date
+def location_day_rng(run_seed_sequence, store_number, date_number, engine):
+    seed_sequence = np.random.SeedSequence(run_seed_sequence.entropy, spawn_key=(store_number, int(date_number)))
+    if engine == 'numpy':
+        return np.random.default_rng(seed_sequence)
+    return random.Random(int(seed_sequence.generate_state(1)[0]))
+
+# Function to simulate every date and category of one location-month, one day at a time with each day's own random stream
+# returns the batch and the number of random draws behind it
+def simulate_location_month(location_name, first_day, last_day, engine, run_seed_sequence, aggregate=False):
+    store_number = locations[location_name]['store_number']
+
+    # Step 1: Get daily sales totals per category for this location-month
+    dates, category_sales = set_daily_sales_totals(first_day, last_day, [location_name])
+    region = locations[location_name]['region']
+
+    # Step 2: For each date and category, simulate sales and keep only the codes of each draw
+    date_numbers = []
+    category_codes = []
+    item_code_blocks = []
+    quantity_blocks = []
+    for date, day_category_sales in zip(dates, category_sales[0].tolist()):
+        date_number = date.astype(schema.DATE_DTYPE)
+        rng = location_day_rng(run_seed_sequence, store_number, date_number, engine)
+        for category, daily_category_sales in zip(schema.CATEGORY_NAMES, day_category_sales):
+            if engine == 'numpy':
+                item_codes, quantities = simulate_sales_vectorized(category, daily_category_sales, rng)
+            else:
+                category_sales_records = simulate_sales(location_name, region, str(date), category, daily_category_sales, rng)
+                item_codes = np.array([schema.MENU_ITEM_CODES[record['menu_item']] for record in category_sales_records], dtype=schema.CODE_DTYPE)
+                quantities = np.array([record['quantity_sold'] for record in category_sales_records], dtype=schema.VALUE_DTYPE)
+            date_numbers.append(date_number)
+            category_codes.append(schema.CATEGORY_CODES[category])
+            item_code_blocks.append(item_codes)
+            quantity_blocks.append(quantities)
+
+    # assemble the typed columns. numpy arrays pickle compactly, so sending a batch back from a worker is cheap
+    draws_per_cell = [len(item_codes) for item_codes in item_code_blocks]
+    menu_item_codes = np.concatenate(item_code_blocks).astype(schema.CODE_DTYPE)
+    quantities = np.concatenate(quantity_blocks).astype(schema.VALUE_DTYPE)
+    row_count = len(menu_item_codes)
+    batch = {
+        'region': np.full(row_count, schema.REGION_CODES[region], dtype=schema.CODE_DTYPE),
+        'location': np.full(row_count, schema.LOCATION_CODES[location_name], dtype=schema.CODE_DTYPE),
+        'date': np.repeat(np.array(date_numbers, dtype=schema.DATE_DTYPE), draws_per_cell),
+        'category': np.repeat(np.array(category_codes, dtype=schema.CODE_DTYPE), draws_per_cell),
+        'menu_item': menu_item_codes,
+        'quantity_sold': quantities,
+        'net_sales': schema.MENU_ITEM_PRICES[menu_item_codes] * quantities,
+    }
+
+    # sum the draws per location / date / category / menu_item before the batch leaves the worker
+    if aggregate:
+        return schema.aggregate_batch(batch), row_count
+    return batch, row_count
+
+# Function to map over a process pool in order while keeping at most `window` results in flight,
+# so finished batches never pile up in memory faster than the caller consumes them.
+# argument_tuples is consumed lazily, so it can be a generator of any length
+def ordered_map(executor, function, argument_tuples, window):
+    pending = deque()
+    for arguments in argument_tuples:
+        pending.append(executor.submit(function, *arguments))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Function to generate the simulation one location-month batch at a time, in location then month order
+# (or month then location order with month_major). location_start_dates overrides the start date per location,
+# and locations that already start after the end date are skipped.
+# pass a report dictionary to have the number of draws and output rows counted into it
+def iter_simulation(engine='numpy', seed=None, workers=1, aggregate=False, report=None,
+                    start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                    location_start_dates=None, month_major=False, portfolio_path=None):
+    if engine not in ('numpy', 'python'):
+        raise ValueError(f"Unknown engine: {engine}")
+    if portfolio_path is not None:
+        use_portfolio(portfolio_path)
+
+    # every location-day draws from its own random stream keyed by the run seed, the store number and the date
+    # (see location_day_rng). the streams do not depend on the task order or the task boundaries, so the output does
+    # not change with the number of workers and a day is generated the same way in a full run and an incremental one.
+    # the tasks are made lazily as the pool takes them, so memory does not grow with stores x months
+    run_seed_sequence = np.random.SeedSequence(seed)
+    tasks = (
+        (location_name, first_day, last_day, engine, run_seed_sequence, aggregate)
+        for location_name, first_day, last_day in iter_location_month_tasks(start_date, end_date, locations, location_start_dates, month_major)
+    )
+
+    if report is None:
+        report = {}
+    report.setdefault('draws', 0)
+    report.setdefault('rows', 0)
+
+    if workers > 1:
+        initializer, initargs = (use_portfolio, (portfolio_path,)) if portfolio_path is not None else (None, ())
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            results = ordered_map(executor, simulate_location_month, tasks, window=workers * 2)
+            for batch, draw_count in results:
+                report['draws'] += draw_count
+                report['rows'] += schema.batch_length(batch)
+                yield batch
+    else:
+        for batch, draw_count in starmap(simulate_location_month, tasks):
+            report['draws'] += draw_count
+            report['rows'] += schema.batch_length(batch)
+            yield batch
+
+# Main function to run the simulation into a single in-memory DataFrame with categorical string columns
+def run_simulation(engine='numpy', seed=None, workers=1, aggregate=False, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                   portfolio_path=None):
+    batches = iter_simulation(engine=engine, seed=seed, workers=workers, aggregate=aggregate, start_date=start_date, end_date=end_date,
+                              portfolio_path=portfolio_path)
+    return schema.batch_to_pandas(schema.concat_batches(batches))
+
+# Function to print how much aggregation reduced the row count
+def print_aggregation_report(report):
+    draws = report['draws']
+    rows = report['rows']
+    print("\n--- Aggregation Report ---\n")
+    print(f"Random draws: {draws:,}")
+    print(f"Aggregated rows: {rows:,}")
+    if rows:
+        print(f"Row reduction: {1 - rows / draws:.1%} ({draws / rows:.1f}x fewer rows)")
+
+# sink that appends each batch to a csv file, writing the header once
+class CsvSalesSink:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = open(file_path, 'w', newline='')
+        self.rows_written = 0
+
+    def write(self, batch):
+        schema.batch_to_pandas(batch).to_csv(self.file, header=self.rows_written == 0, index=False)
+        self.rows_written += schema.batch_length(batch)
+
+    def close(self):
+        self.file.close()
+
+# sink that buffers batches into row groups of about ROW_GROUP_ROWS rows in a single parquet file.
+# location-month batches are small, and writing each one as its own row group would repeat the
+# dictionary pages (the full location list for large portfolios) thousands of times
+class ParquetSalesSink:
+    def __init__(self, file_path, compression='brotli'):
+        self.file_path = file_path
+        self.writer = pq.ParquetWriter(file_path, schema.ARROW_SCHEMA, compression=compression)
+        self.buffer = []
+        self.buffered_rows = 0
+        self.rows_written = 0
+
+    def write(self, batch):
+        self.buffer.append(batch)
+        self.buffered_rows += schema.batch_length(batch)
+        self.rows_written += schema.batch_length(batch)
+        if self.buffered_rows >= ROW_GROUP_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.buffered_rows:
+            self.writer.write_batch(schema.batch_to_arrow(schema.concat_batches(self.buffer)), row_group_size=self.buffered_rows)
+        self.buffer = []
+        self.buffered_rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+SALES_SINKS = {
+    'csv': CsvSalesSink,
+    'parquet': ParquetSalesSink,
+}
+
+# sink that writes batches into a hive-style year=/month= partitioned parquet dataset, one new file per partition per run.
+# files are written under a dot-prefixed temporary name (which dataset readers skip, even if a crash leaves it behind)
+# and renamed once closed, so readers never pick up a partial file. file names carry a random run id, so runs never
+# overwrite each other's files
+class PartitionedParquetSalesSink:
+    def __init__(self, dataset_directory, compression='brotli'):
+        self.dataset_directory = dataset_directory
+        self.compression = compression
+        self.run_id = uuid.uuid4().hex
+        self.partition = None
+        self.writer = None
+        self.file_path = None
+        self.file_paths = []
+        self.buffer = []
+        self.buffered_rows = 0
+        self.rows_written = 0
+
+    def temporary_file_path(self):
+        return os.path.join(os.path.dirname(self.file_path), f".{os.path.basename(self.file_path)}.tmp")
+
+    def partition_directory(self, partition):
+        year, month = partition
+        return os.path.join(self.dataset_directory, f"year={year}", f"month={month:02d}")
+
+    def write(self, batch):
+        if schema.batch_length(batch) == 0:
+            return
+
+        # every batch covers a single location-month, so its first date names the partition
+        month = batch['date'][0].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        partition = (1970 + month // 12, month % 12 + 1)
+        if partition != self.partition:
+            self.close()
+            directory = self.partition_directory(partition)
+            os.makedirs(directory, exist_ok=True)
+            part_number = sum(1 for file_path in self.file_paths if os.path.dirname(file_path) == directory)
+            self.partition = partition
+            self.file_path = os.path.join(directory, f"part-{self.run_id}-{part_number}.parquet")
+            self.writer = pq.ParquetWriter(self.temporary_file_path(), schema.ARROW_SCHEMA, compression=self.compression)
+
+        self.buffer.append(batch)
+        self.buffered_rows += schema.batch_length(batch)
+        self.rows_written += schema.batch_length(batch)
+        if self.buffered_rows >= ROW_GROUP_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.buffered_rows:
+            self.writer.write_batch(schema.batch_to_arrow(schema.concat_batches(self.buffer)), row_group_size=self.buffered_rows)
+        self.buffer = []
+        self.buffered_rows = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            os.replace(self.temporary_file_path(), self.file_path)
+            self.file_paths.append(self.file_path)
+            self.writer = None
+            self.partition = None
+
+# Function to find the last date already generated for each location in a partitioned dataset.
+# partitions are read newest first and the scan stops as soon as every location has been seen,
+# so a daily refresh only reads the latest month
+def last_generated_dates(dataset_directory):
+    if not os.path.isdir(dataset_directory):
+        return {}
+
+    dataset = ds.dataset(dataset_directory, format='parquet', partitioning='hive')
+    fragments_by_partition = {}
+    for fragment in dataset.get_fragments():
+        partition_keys = ds.get_partition_keys(fragment.partition_expression)
+        partition = (partition_keys['year'], partition_keys['month'])
+        fragments_by_partition.setdefault(partition, []).append(fragment)
+
+    last_dates = {}
+    for partition in sorted(fragments_by_partition, reverse=True):
+        partition_last_dates = {}
+        for fragment in fragments_by_partition[partition]:
+            for record_batch in fragment.to_batches(columns=['location', 'date']):
+                location_dates = record_batch.to_pandas().groupby('location', observed=True)['date'].max()
+                for location_name, date in location_dates.items():
+                    date = np.datetime64(date, 'D')
+                    if location_name not in partition_last_dates or date > partition_last_dates[location_name]:
+                        partition_last_dates[location_name] = date
+        for location_name, date in partition_last_dates.items():
+            last_dates.setdefault(location_name, date)
+        if all(location_name in last_dates for location_name in locations):
+            break
+
+    return last_dates
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate simulated sales data for the restaurant chain.")
+    parser.add_argument('--engine', choices=['numpy', 'python'], default='numpy',
+                        help="numpy draws sales in blocks, python is the original one-draw-at-a-time reference loop")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible runs")
+    parser.add_argument('--start-date', default=DEFAULT_START_DATE, help="first date to generate (YYYY-MM-DD)")
+    parser.add_argument('--end-date', default=None,
+                        help=f"last date to generate (YYYY-MM-DD), defaults to {DEFAULT_END_DATE} or to yesterday with --incremental")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes to spread the location-months across")
+    parser.add_argument('--format', choices=list(SALES_SINKS), default='csv', help="output file format")
+    parser.add_argument('--aggregate', action='store_true',
+                        help="sum the draws to 1 row per location / date / category / menu_item before output")
+    parser.add_argument('--incremental', action='store_true',
+                        help="append only the missing days to the partitioned parquet dataset in --dataset-dir")
+    parser.add_argument('--dataset-dir', default=DEFAULT_DATASET_DIRECTORY, help="partitioned dataset used by --incremental")
+    parser.add_argument('--portfolio', default=None, help="store portfolio parquet file written by store_portfolio.py")
+    args = parser.parse_args()
+
+    if args.portfolio is not None:
+        use_portfolio(args.portfolio)
+        print(f"\nUsing a portfolio of {len(locations):,} stores from {args.portfolio}")
+
+    location_start_dates = None
+    if args.incremental:
+        end_date = args.end_date or str(datetime.now().date() - timedelta(days=1))
+
+        # continue every location from the day after its last generated date
+        last_dates = last_generated_dates(args.dataset_dir)
+        location_start_dates = {location_name: str(date + 1) for location_name, date in last_dates.items()}
+        missing_locations = [location_name for location_name in locations if location_name not in last_dates]
+        print(f"\nFound existing data for {len(last_dates)} locations in {args.dataset_dir}")
+        if missing_locations:
+            print(f"Starting {len(missing_locations)} locations without data at {args.start_date}")
+
+        output_file_path = args.dataset_dir
+        sink = PartitionedParquetSalesSink(args.dataset_dir)
+    else:
+        end_date = args.end_date or DEFAULT_END_DATE
+
+        current_directory = os.path.dirname(__file__)
+        # if it doesn't already exist, make a folder called "generated_data" within the current folder
+        if not os.path.exists(f"{current_directory}/generated_data"):
+            os.makedirs(f"{current_directory}/generated_data")
+        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_file_path = f"{current_directory}/generated_data/sales_data_per_location_{current_datetime}.{args.format}"
+        sink = SALES_SINKS[args.format](output_file_path)
+
+    # Run the simulation, streaming each location-month batch to the output
+    report = {}
+    try:
+        batches = iter_simulation(engine=args.engine, seed=args.seed, workers=args.workers, aggregate=args.aggregate, report=report,
+                                  start_date=args.start_date, end_date=end_date,
+                                  location_start_dates=location_start_dates, month_major=args.incremental,
+                                  portfolio_path=args.portfolio)
+        for batch in batches:
+            if sink.rows_written == 0:
+                print("\n--- Sales Data ---\n")
+                print(schema.batch_to_pandas(batch).head())
+            sink.write(batch)
+    finally:
+        sink.close()
+
+    if args.incremental and sink.rows_written == 0:
+        print(f"\nDataset is already up to date through {end_date}\n")
+    elif args.aggregate:
+        print_aggregation_report(report)
+
+    print(f"\nWrote {sink.rows_written:,} rows to {output_file_path}\n")
+
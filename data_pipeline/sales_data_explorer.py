@@ -1,68 +1,266 @@
 '''
-# sales_dataset_cleaner.py
+# sales_data_explorer.py
+
+goals:
+- profile a generated parquet file or partitioned dataset of any size in one streaming pass, with memory bounded
+  by the size of the results rather than the size of the data
+
+functionality:
+- the row groups to read are planned from the parquet footers: partitions and row groups outside the region and
+  date range (--start-date, --end-date, --region) are pruned by their partition keys and statistics
+- every row group is read, filtered and re-encoded to the shared lookup codes (see sales_data_schema.py) on its own,
+  and the row groups are spread over a process pool (--workers), so files and row groups are profiled in parallel
+- each row group returns small partial results that are merged as they arrive:
+    - null counts per column (rows with nulls are counted, then left out of the aggregates)
+    - quantity_sold, net_sales and rows per menu_item, category, location and region (np.bincount on the codes)
+    - the distinct location-days, packed into int64 keys and merged whenever they pile up, for the unique dates,
+      first date and last date of each location
+- the results are written as csv tables to --output-directory, with a summary.json:
+    - menu_items.csv, categories.csv, locations.csv, regions.csv, columns.csv
+- only a short summary and the top --top rows of each table are printed
+
+usage:
+- python data_pipeline/sales_data_explorer.py <parquet file or partitioned dataset directory>
+- python data_pipeline/sales_data_explorer.py dash_app/data/sales_data --start-date 2023-03-01 --end-date 2023-03-31 --region Southeast
+- python data_pipeline/sales_data_explorer.py dash_app/data/sales_data.parquet --workers 8 --output-directory /tmp/profile
 '''
 
+import argparse
+import json
 import os
-import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import sales_data_schema as schema
+from sales_data_pipeline import (STAGING_DATA_DIRECTORY,
+                                 convert_bytes,
+                                 dataset_filter,
+                                 encode_block,
+                                 peak_memory_mb,
+                                 use_portfolio,
+                                 )
+
+PROFILE_DIRECTORY = os.path.join(STAGING_DATA_DIRECTORY, 'profile')
+
+# distinct location-day keys held before they are merged into one sorted array
+LOCATION_DAY_MERGE_KEYS = 4_000_000
+
+# aggregated columns and the dimensions they are summed by
+DIMENSIONS = ['menu_item', 'category', 'location', 'region']
+
+# Function to list the row groups to profile as (file path, row group id, partition region) tasks,
+# and count the row groups pruned by the region and date range
+def plan_row_groups(data_path, start_date=None, end_date=None, regions=None):
+    partitioned = os.path.isdir(data_path)
+    if partitioned:
+        # discover the partition keys from the directory names: the pipeline's dataset is partitioned by region, year
+        # and month, while the generator's --incremental dataset is partitioned by year and month and keeps the region
+        # as a column of its files
+        dataset = ds.dataset(data_path, format='parquet', partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    else:
+        dataset = ds.dataset(data_path, format='parquet')
+    expression = dataset_filter(start_date, end_date, regions, partitioned=partitioned)
+
+    tasks = []
+    files = 0
+    total_row_groups = 0
+    size_bytes = 0
+    for fragment in dataset.get_fragments():
+        files += 1
+        total_row_groups += fragment.metadata.num_row_groups
+        size_bytes += os.path.getsize(fragment.path)
+        region = ds.get_partition_keys(fragment.partition_expression).get('region') if partitioned else None
+        # splitting with the filter keeps the row groups whose partition keys and statistics may match it
+        for row_group_fragment in fragment.split_by_row_group(filter=expression, schema=dataset.schema):
+            tasks.append((fragment.path, row_group_fragment.row_groups[0].id, region))
+    return tasks, {'files': files, 'row_groups': total_row_groups, 'size_bytes': size_bytes}
+
+# Function to profile one row group and return its partial results
+def profile_row_group(file_path, row_group, region, start_date=None, end_date=None, regions=None):
+    parquet_file = pq.ParquetFile(file_path)
+    columns = [column for column in schema.COLUMNS if column in parquet_file.schema_arrow.names]
+    table = parquet_file.read_row_group(row_group, columns=columns)
+
+    # files of a partitioned dataset leave the region out: it is the partition's
+    if 'region' not in columns:
+        region_codes = np.full(table.num_rows, schema.REGION_NAMES.index(region), dtype=schema.CODE_DTYPE)
+        table = table.add_column(0, 'region', pa.DictionaryArray.from_arrays(region_codes, schema.ARROW_DICTIONARIES['region']))
+    table = table.select(schema.COLUMNS)
+
+    expression = dataset_filter(start_date, end_date, regions, partitioned=False)
+    if expression is not None:
+        table = table.filter(expression)
+
+    rows = table.num_rows
+    null_counts = {column: table.column(column).null_count for column in schema.COLUMNS}
+    if any(null_counts.values()):
+        table = table.drop_null()
+    batch = encode_block(table)
+
+    partial = {'rows': rows, 'rows_with_nulls': rows - table.num_rows, 'null_counts': null_counts}
+    for dimension in DIMENSIONS:
+        codes = batch[dimension]
+        size = len(schema.DICTIONARIES[dimension])
+        partial[dimension] = {
+            'rows': np.bincount(codes, minlength=size).astype(np.int64),
+            'quantity_sold': np.bincount(codes, weights=batch['quantity_sold'], minlength=size).astype(np.int64),
+            'net_sales': np.bincount(codes, weights=batch['net_sales'], minlength=size).astype(np.int64),
+        }
+    # pack location and day into one int64 key per distinct location-day
+    partial['location_days'] = np.unique((batch['location'].astype(np.int64) << 32) | (batch['date'].astype(np.int64) & 0xFFFFFFFF))
+    return partial
 
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
+# Function to stream the row groups through the profiler and merge their partial results
+def profile_data(data_path, start_date=None, end_date=None, regions=None, workers=1, portfolio_path=None):
+    start = time.perf_counter()
+    tasks, files = plan_row_groups(data_path, start_date, end_date, regions)
 
-# Load the sales_dataset_2023.csv file into a dataframe
-current_directory = os.path.dirname(__file__)
-df = pd.read_csv(f"{current_directory}/generated_data/sales_data_per_location_2024-09-26_16-50-15.csv")
-# print the file size of the csv file
-print("\n--- File Size of CSV ---\n")
-print(f"File Size: {os.path.getsize(f'{current_directory}/generated_data/sales_data_per_location_2024-09-26_14-59-25.csv')} bytes")
+    profile = {
+        'rows': 0,
+        'rows_with_nulls': 0,
+        'null_counts': {column: 0 for column in schema.COLUMNS},
+        **{dimension: {name: np.zeros(len(schema.DICTIONARIES[dimension]), dtype=np.int64) for name in ['rows', 'quantity_sold', 'net_sales']}
+           for dimension in DIMENSIONS},
+    }
+    location_days = [np.empty(0, dtype=np.int64)]
+    pending_keys = 0
 
-print("\n--- Initial DataFrame Head ---\n")
-print(df.head())
-print("\n--- DataFrame Info ---\n")
-print(df.info())
+    def merge(partial):
+        nonlocal location_days, pending_keys
+        profile['rows'] += partial['rows']
+        profile['rows_with_nulls'] += partial['rows_with_nulls']
+        for column, count in partial['null_counts'].items():
+            profile['null_counts'][column] += count
+        for dimension in DIMENSIONS:
+            for name, values in partial[dimension].items():
+                profile[dimension][name] += values
+        location_days.append(partial['location_days'])
+        pending_keys += len(partial['location_days'])
+        if pending_keys > LOCATION_DAY_MERGE_KEYS:
+            location_days = [np.unique(np.concatenate(location_days))]
+            pending_keys = len(location_days[0])
 
-# Print total count of rows with null values per column
-print("\n--- Count of null values in each column ---\n")
-print(df.isnull().sum())
+    arguments = [(file_path, row_group, region, start_date, end_date, regions) for file_path, row_group, region in tasks]
+    if workers > 1 and len(tasks) > 1:
+        initializer, initargs = (use_portfolio, (portfolio_path,)) if portfolio_path is not None else (None, ())
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=initializer, initargs=initargs) as executor:
+            for partial in executor.map(profile_row_group, *zip(*arguments)):
+                merge(partial)
+    else:
+        for task in arguments:
+            merge(profile_row_group(*task))
 
-# Total quantity sold and dollar net_sales per menu_item
-df_items = df.groupby('menu_item').agg({
-    'quantity_sold': 'sum',
-    'net_sales': 'sum'
-}).sort_values(by='quantity_sold', ascending=False)
+    keys = np.unique(np.concatenate(location_days))
+    location_codes = (keys >> 32).astype(np.int64)
+    days = (keys & 0xFFFFFFFF).astype(np.uint32).astype(np.int32)
+    unique_dates = np.bincount(location_codes, minlength=len(schema.LOCATION_NAMES))
+    # keys are sorted by location, then day: each location's first and last keys hold its date range
+    first_keys = np.cumsum(unique_dates) - unique_dates
+    last_keys = np.cumsum(unique_dates) - 1
+    padded_days = np.append(days, 0)
+    profile['location']['unique_dates'] = unique_dates
+    profile['location']['first_date'] = np.where(unique_dates > 0, padded_days[first_keys], 0)
+    profile['location']['last_date'] = np.where(unique_dates > 0, padded_days[np.maximum(last_keys, 0)], 0)
 
-print("\n--- Total quantity sold per menu_item (Top 100) ---\n")
-print(df_items.head(100))
+    profile['summary'] = {
+        'path': os.path.abspath(data_path),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'filters': {'start_date': start_date, 'end_date': end_date, 'regions': regions},
+        'files': files['files'],
+        'size_bytes': files['size_bytes'],
+        'row_groups': files['row_groups'],
+        'row_groups_read': len(tasks),
+        'rows': profile['rows'],
+        'rows_with_nulls': profile['rows_with_nulls'],
+        'first_date': str(np.datetime64(int(days.min()), 'D')) if len(days) else None,
+        'last_date': str(np.datetime64(int(days.max()), 'D')) if len(days) else None,
+        'locations': int(np.count_nonzero(unique_dates)),
+        'seconds': time.perf_counter() - start,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+    return profile
 
-# Total dollar net_sales per menu_item (already sorted by quantity, but you can sort by net_sales if needed)
-df_items_sorted_by_sales = df_items.sort_values(by='net_sales', ascending=False)
+# Function to turn the profile into arrow tables, sorted like the original exploration printouts
+def profile_tables(profile):
+    tables = {}
+    for dimension, file_name, sort_column in [('menu_item', 'menu_items', 'quantity_sold'), ('category', 'categories', 'quantity_sold'),
+                                              ('location', 'locations', 'net_sales'), ('region', 'regions', 'net_sales')]:
+        values = profile[dimension]
+        columns = {dimension: pa.array(schema.DICTIONARIES[dimension], type=pa.string())}
+        if dimension == 'menu_item':
+            columns['category'] = pa.array([schema.CATEGORY_NAMES[code] for code in schema.MENU_ITEM_CATEGORY_CODES])
+        for name in ['rows', 'quantity_sold', 'net_sales']:
+            columns[name] = pa.array(values[name])
+        if dimension == 'location':
+            columns['unique_dates'] = pa.array(values['unique_dates'])
+            columns['first_date'] = pa.array(values['first_date'].astype(np.int32), type=pa.date32())
+            columns['last_date'] = pa.array(values['last_date'].astype(np.int32), type=pa.date32())
+        table = pa.table(columns).filter(pc.greater(pa.array(values['rows']), 0))
+        tables[file_name] = table.sort_by([(sort_column, 'descending')])
 
-print("\n--- Total dollar net_sales per menu_item (Top 100) ---\n")
-print(df_items_sorted_by_sales.head(100))
+    tables['columns'] = pa.table({
+        'column': schema.COLUMNS,
+        'type': [str(schema.ARROW_SCHEMA.field(column).type) for column in schema.COLUMNS],
+        'null_count': [profile['null_counts'][column] for column in schema.COLUMNS],
+    })
+    return tables
 
-# Total quantity and dollar net_sales per category
-df_category = df.groupby('category').agg({
-    'quantity_sold': 'sum',
-    'net_sales': 'sum'
-}).sort_values(by='quantity_sold', ascending=False)
+# Function to write the profile tables as csv files and the summary as json
+def write_profile(profile, tables, output_directory):
+    os.makedirs(output_directory, exist_ok=True)
+    for file_name, table in tables.items():
+        pv.write_csv(table, os.path.join(output_directory, f"{file_name}.csv"))
+    with open(os.path.join(output_directory, 'summary.json'), 'w') as file:
+        json.dump(profile['summary'], file, indent=2)
 
-print("\n--- Total quantity sold per category ---\n")
-print(df_category)
+# Function to print the summary and the first rows of each table
+def print_profile(profile, tables, top):
+    summary = profile['summary']
+    print(f"\n--- Profile of {summary['path']} ---\n")
+    print(f"Size: {convert_bytes(summary['size_bytes'])} in {summary['files']:,} files")
+    print(f"Row groups read: {summary['row_groups_read']:,} of {summary['row_groups']:,}")
+    print(f"Rows: {summary['rows']:,} from {summary['first_date']} to {summary['last_date']} at {summary['locations']:,} locations")
+    print(f"Profiled in {summary['seconds']:.2f} s ({summary['rows'] / max(summary['seconds'], 1e-9):,.0f} rows/sec), "
+          f"peak memory {summary['peak_memory_mb']:,.0f} MB")
 
-# Total dollar net_sales per category (sorted by net_sales)
-df_category_sorted_by_sales = df_category.sort_values(by='net_sales', ascending=False)
+    print(f"\n--- Count of null values in each column ({profile['rows_with_nulls']:,} rows left out of the totals) ---\n")
+    for column, count in profile['null_counts'].items():
+        print(f"{column:<16}{count:>14,}")
 
-print("\n--- Total dollar net_sales per category ---\n")
-print(df_category_sorted_by_sales)
+    for file_name, columns, title in [
+        ('menu_items', ['menu_item', 'quantity_sold', 'net_sales'], "Total quantity sold and net_sales per menu_item"),
+        ('categories', ['category', 'quantity_sold', 'net_sales'], "Total quantity sold and net_sales per category"),
+        ('locations', ['location', 'net_sales', 'unique_dates'], "Total net_sales and unique dates per location"),
+    ]:
+        table = tables[file_name]
+        print(f"\n--- {title} (top {min(top, table.num_rows)} of {table.num_rows:,}) ---\n")
+        print(''.join(f"{column:>24}" if column != columns[0] else f"{column:<40}" for column in columns))
+        for row in table.select(columns).slice(0, top).to_pylist():
+            print(''.join(f"{row[column]:>24,}" if column != columns[0] else f"{row[column]:<40}" for column in columns))
 
-# Total net_sales per location
-df_location = df.groupby('location').agg({
-    'net_sales': 'sum'
-}).sort_values(by='net_sales', ascending=False)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile a generated parquet file or partitioned dataset in one streaming pass.")
+    parser.add_argument('path', help="parquet file or partitioned dataset directory")
+    parser.add_argument('--start-date', default=None, help="first date to profile")
+    parser.add_argument('--end-date', default=None, help="last date to profile")
+    parser.add_argument('--region', nargs='+', default=None, help="regions to profile")
+    parser.add_argument('--portfolio', default=None, help="store portfolio parquet file the data was generated from")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes profiling row groups in parallel")
+    parser.add_argument('--output-directory', default=PROFILE_DIRECTORY, help="directory the profile tables are written to")
+    parser.add_argument('--top', type=int, default=10, help="rows of each table to print")
+    args = parser.parse_args()
 
-print("\n--- Total net_sales per location ---\n")
-print(df_location)
+    if args.portfolio:
+        use_portfolio(args.portfolio)
 
-# print how many unique dates are represented for each location
-unique_dates_per_location = df.groupby('location')['date'].nunique()
-print("\n--- Unique Dates per Location ---\n")
-print(unique_dates_per_location)
\ No newline at end of file
+    profile = profile_data(args.path, args.start_date, args.end_date, args.region, workers=args.workers, portfolio_path=args.portfolio)
+    tables = profile_tables(profile)
+    write_profile(profile, tables, args.output_directory)
+    print_profile(profile, tables, args.top)
+    print(f"\nWrote the profile tables to {args.output_directory}\n")
@@ -1,38 +1,179 @@
+'''
+# sales_data_pipeline.py
+
+goals:
+- convert the generated csv files in the staging directory to the parquet data the dashboard reads
+
+functionality:
+- the csv is read in blocks of CSV_BLOCK_SIZE bytes, cut at the last newline, and every block is parsed by
+  pyarrow's csv reader with an explicit schema:
+    - region, location, category, menu_item: dictionary-encoded strings
+    - date: date32
+    - quantity_sold, net_sales: int32
+- blocks are written as row groups of the profile's row_group_rows rows with a pyarrow ParquetWriter, so memory
+  stays bounded by a few blocks and multi-GB csv files convert without loading them into memory
+    - pyarrow's own streaming reader (pyarrow.csv.open_csv) reads ahead across the whole file, so it does not
+      bound memory; the blocks are cut here instead, which is safe because the generated csv never quotes newlines
+- the run logs rows/sec and peak memory
+
+layouts (--layout):
+- file (default): the latest csv in the staging directory becomes a single sales_data.parquet, in the order the
+  generator wrote the rows
+    - the parquet metadata records the csv (path, size, modification time) and the profile it was converted from,
+      and a re-run whose latest csv and profile match skips the conversion
+- partitioned: every csv in the staging directory is converted into a hive-partitioned dataset at
+  sales_data/region=<region>/year=<YYYY>/month=<MM>/part-<csv name>.parquet
+    - the string columns are re-encoded to the generator's shared lookup tables (sales_data_schema.py), so every
+      file has the same int16 dictionary codes; unknown regions, locations, categories or menu items are an error
+      (use --portfolio for csv files generated from a synthetic store portfolio)
+    - pass 1 streams the csv blocks and spills each block's rows to one uncompressed arrow file per partition
+    - pass 2 sorts each partition by date, then location, and writes it with row groups of the profile's
+      row_group_rows rows, so the min/max statistics of every row group cover a narrow date range
+    - the region is held by the directory name, not the files
+    - memory is bounded by the largest partition (a region-month) of a csv instead of the whole file
+    - each csv is one output partition of the dataset: its rows land in its own part file of every region-month
+      it covers, so the dataset is the union of the staged csv files
+    - staged csv files must not overlap: no two of them may hold rows of the same location on the same dates, or
+      those rows would be counted twice. the manifest records the first and last date of every location in each csv,
+      and a run whose converted csv files overlap another staged csv (in a location's date range) fails before
+      anything is committed, like a validation failure
+
+incremental conversion (partitioned layout):
+- a manifest (sales_data/_manifest.json) records, for every converted csv, its path, size, modification time,
+  sha256 content hash, parquet profile and output files
+- a csv is only converted when it is new or changed:
+    - a csv whose size and modification time match the manifest is skipped without being read, so a re-run with
+      no new input only stats the staging directory and finishes in milliseconds
+    - a csv whose size or modification time changed is hashed, and only converted when its content changed
+    - changing the parquet profile converts every csv again
+    - the outputs of a csv that left the staging directory are removed from the dataset
+- the changed csv files are converted in parallel on a process pool (--workers), each into its own hidden work
+  directory inside the dataset (files starting with '.' or '_' are ignored by dataset readers)
+- outputs are committed when every conversion has finished: each part file is moved into place with an atomic
+  rename over the previous version of the same csv's part (part names only depend on the csv name), then the parts
+  of region-months the csv no longer covers are removed, and the manifest is replaced last. a dashboard reading
+  during a run sees complete files only, never a half-written one, and never a csv's old and new rows side by side
+- readers skip whole files by region and month and whole row groups by date:
+    - sales_data_explorer.py plans its row groups with dataset_filter() on region and date range
+    - dash_app/app.py reads the dataset when it exists, limited by the APP_START_DATE, APP_END_DATE and
+      APP_REGIONS environment variables
+
+validation:
+- every csv block is validated while it streams through the conversion (see sales_data_validation.py): nulls,
+  non-positive quantities, net_sales against quantity_sold x menu price, unknown dimension values and per-location
+  date gaps, with a json report per csv in APP_DATA_DIRECTORY/validation
+- the conversion fails fast, before its output is committed, once --max-invalid-rows invalid rows are exceeded,
+  and at the end of the csv when more than --max-date-gaps location-days are missing
+- invalid rows that the thresholds let through are left out of the output (they are counted in the report)
+
+rollups:
+- after the conversion the pipeline materializes rollup tables of net_sales and quantity_sold in a rollups directory
+  next to the raw data, so consumers can answer slicer combinations without re-aggregating the raw rows:
+    - daily.parquet: one row per date, location and menu item (the raw schema, sorted by date and location)
+    - monthly.parquet: one row per month, location and menu item
+    - by_region.parquet, by_location.parquet, by_category.parquet, by_menu_item.parquet: totals over the whole range
+- region and category are kept on every row, and strings use the shared dictionary codes
+- the rollups are built in one streaming pass over the raw row groups (or region-month partitions)
+- rollups/_rollups.json, and the parquet metadata of every table, records the source_version of the raw data they
+  were built from: a hash of the manifest for the partitioned dataset, or of the parquet file. the rollups are only
+  rebuilt when the source version changes
+
+snapshot:
+- the pipeline also writes sales_data.arrow, an uncompressed arrow ipc (feather v2) file of the raw data that the
+  dashboard memory-maps instead of decoding parquet at startup:
+    - already typed: date32 dates, int32 values and int16 dictionary codes into the shared lookup tables
+    - sorted by date, then location, in a single record batch, so every column is one contiguous buffer
+    - the schema metadata holds the source_version, row count, first and last date and the values of every
+      dictionary column that the rows use, so the dashboard can fill its slicers without reading the rows
+- it is assembled month by month through memory-mapped columns, so the pipeline does not hold the whole dataset
+- it is replaced with an atomic rename and only rewritten when the source version changes
+- --skip-snapshot removes a snapshot left from an earlier version of the raw data, so the dashboard does not keep
+  serving it
+
+parquet profiles (PARQUET_PROFILES):
+- a profile pins the codec, codec level, dictionary encoding and row group size of the parquet output
+- the profile is picked with --profile or the PARQUET_PROFILE environment variable (brotli by default)
+- benchmarks/parquet_layouts.py measures write time, read time and size of codecs, levels, dictionary encoding
+  and row group sizes on the same csv, to choose the profile to pin
+
+usage:
+- python data_pipeline/sales_data_pipeline.py
+- python data_pipeline/sales_data_pipeline.py --layout partitioned
+- PARQUET_PROFILE=zstd python data_pipeline/sales_data_pipeline.py --layout partitioned
+- python data_pipeline/sales_data_pipeline.py --layout partitioned --workers 8
+'''
+
+import argparse
+import hashlib
+import json
 import os
-import pandas as pd
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import sales_data_schema as schema
+from sales_data_validation import SalesDataValidator, ValidationError, MAX_INVALID_ROWS, MAX_DATE_GAPS
+from store_portfolio import load_portfolio
 
 current_directory = os.path.dirname(__file__)
 project_directory = os.path.join(current_directory, os.pardir)
-STAGING_DATA_DIRECTORY = os.path.join(project_directory, 'data_pipeline', 'generated_data')
-APP_DATA_DIRECTORY = os.path.join(project_directory, 'dash_app', 'data')
+STAGING_DATA_DIRECTORY = os.environ.get('STAGING_DATA_DIRECTORY', os.path.join(project_directory, 'data_pipeline', 'generated_data'))
+APP_DATA_DIRECTORY = os.environ.get('APP_DATA_DIRECTORY', os.path.join(project_directory, 'dash_app', 'data'))
+
+# bytes of csv read per block, and so roughly the size of each row group (about 300k rows per 16 MB)
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
 
-# list all available files in the staging directory
-csv_files = [f for f in os.listdir(STAGING_DATA_DIRECTORY) if f.endswith('.csv')]
+# rows per row group in the partitioned dataset. one region-month of the 2023 data is about 150k rows (roughly
+# 5k rows per day), so a row group covers a few weeks and a one-week date filter skips most of them
+PARTITION_ROW_GROUP_ROWS = 100_000
 
-if not csv_files:
-    raise FileNotFoundError("No CSV files found in the staging directory.")
+LAYOUTS = ['file', 'partitioned']
 
-for file in csv_files:
-    print(f"Found CSV file: {file}")
+# parquet write settings that can be pinned by name. brotli gives the smallest files but is the slowest to decode,
+# zstd and lz4 trade some size for faster reads (see benchmarks/parquet_layouts.py)
+PARQUET_PROFILES = {
+    'brotli': {'compression': 'brotli', 'compression_level': None, 'use_dictionary': True, 'row_group_rows': PARTITION_ROW_GROUP_ROWS},
+    'zstd': {'compression': 'zstd', 'compression_level': 3, 'use_dictionary': True, 'row_group_rows': PARTITION_ROW_GROUP_ROWS},
+    'lz4': {'compression': 'lz4', 'compression_level': None, 'use_dictionary': True, 'row_group_rows': PARTITION_ROW_GROUP_ROWS},
+    'uncompressed': {'compression': 'none', 'compression_level': None, 'use_dictionary': True, 'row_group_rows': PARTITION_ROW_GROUP_ROWS},
+}
+PARQUET_PROFILE = os.environ.get('PARQUET_PROFILE', 'brotli')
 
-# find the most recent (last modified) CSV file in the staging directory
-latest_csv_file = max([os.path.join(STAGING_DATA_DIRECTORY, f) for f in csv_files], key=os.path.getmtime)
+# manifest of the csv files converted into the partitioned dataset, kept inside the dataset directory
+# (the leading underscore keeps dataset readers from treating it as data)
+MANIFEST_FILE_NAME = '_manifest.json'
 
-# print the name of the latest CSV file
-print(f"\nLatest CSV file found: {latest_csv_file}\n")
+# rollup tables materialized next to the raw data, and the file describing them
+ROLLUP_DIRECTORY_NAME = 'rollups'
+ROLLUP_METADATA_FILE_NAME = '_rollups.json'
+ROLLUP_DIMENSIONS = ['region', 'location', 'category', 'menu_item']
 
-# load CSV file into a pandas dataframe
-source_data = pd.read_csv(latest_csv_file)
+# json validation reports, one per converted csv
+VALIDATION_DIRECTORY_NAME = 'validation'
 
-# ensure the app data directory exists
-if not os.path.exists(APP_DATA_DIRECTORY):
-    os.makedirs(APP_DATA_DIRECTORY)
-    
-# convert dataframe to parquet with brotli for best file size
-parquet_file_path = os.path.join(APP_DATA_DIRECTORY, 'sales_data.parquet')
-source_data.to_parquet(parquet_file_path, compression='brotli')
+# parquet metadata key of the csv and profile that sales_data.parquet was converted from (file layout)
+PARQUET_SOURCE_METADATA_KEY = b'source_csv'
 
-print(f"\nCSV file {latest_csv_file} successfully converted to Parquet at {parquet_file_path}\n")
+# uncompressed arrow ipc snapshot of the raw data that the dashboard memory-maps
+SNAPSHOT_FILE_NAME = 'sales_data.arrow'
+
+# rows of partial daily aggregates collected before they are merged
+ROLLUP_MERGE_ROWS = 4_000_000
+
+# the generator's schema with int32 dictionary indices, the only index type the csv reader can decode into
+CSV_SCHEMA = pa.schema([
+    pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field
+    for field in schema.ARROW_SCHEMA
+])
 
 def convert_bytes(num):
     """
@@ -42,11 +183,833 @@ def convert_bytes(num):
         if num < 1024:
             return f"{num:.2f} {unit}"
         num /= 1024
-        
-# print the file sizes of the CSV and Parquet files
-csv_size_bytes = os.path.getsize(latest_csv_file)
-parquet_size_bytes = os.path.getsize(parquet_file_path)
-print(f"CSV File Size: {convert_bytes(csv_size_bytes)}\n")
-print(f"Parquet File Size: {convert_bytes(parquet_size_bytes)}\n")
-print(f"Parquet File Compression Ratio: {os.path.getsize(latest_csv_file) / os.path.getsize(parquet_file_path):.2f}x\n")
-print(f"Parquet size as a percentage of CSV size: {os.path.getsize(parquet_file_path) / os.path.getsize(latest_csv_file) * 100:.2f}%\n")
\ No newline at end of file
+
+def find_latest_csv_file(staging_data_directory):
+    """
+    This function will return the most recently modified CSV file in the staging directory.
+    """
+    # list all available files in the staging directory
+    csv_files = [f for f in os.listdir(staging_data_directory) if f.endswith('.csv')]
+
+    if not csv_files:
+        raise FileNotFoundError("No CSV files found in the staging directory.")
+
+    for file in csv_files:
+        print(f"Found CSV file: {file}")
+
+    # find the most recent (last modified) CSV file in the staging directory
+    return max([os.path.join(staging_data_directory, f) for f in csv_files], key=os.path.getmtime)
+
+def dataset_partitioning():
+    """
+    This function will return the hive partitioning of the partitioned dataset, with region dictionary-encoded.
+    """
+    return ds.HivePartitioning(
+        pa.schema([('region', schema.ARROW_SCHEMA.field('region').type), ('year', pa.int16()), ('month', pa.int8())]),
+        dictionaries={'region': schema.ARROW_DICTIONARIES['region'], 'year': None, 'month': None},
+    )
+
+def peak_memory_mb():
+    """
+    This function will return the peak resident memory of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def parquet_write_options(profile):
+    """
+    This function will return the pyarrow Parquet writer options of a profile.
+    """
+    return {
+        'compression': profile['compression'],
+        'compression_level': profile['compression_level'],
+        'use_dictionary': profile['use_dictionary'],
+    }
+
+def iter_csv_blocks(csv_file_path, block_size=CSV_BLOCK_SIZE):
+    """
+    This function will parse a CSV file block by block and yield one Arrow table per block.
+    """
+    with open(csv_file_path, 'rb') as csv_file:
+        column_names = csv_file.readline().decode().strip().split(',')
+        read_options = pv.ReadOptions(column_names=column_names, use_threads=False)
+        convert_options = pv.ConvertOptions(column_types=CSV_SCHEMA, include_columns=CSV_SCHEMA.names)
+
+        # carry the partial line at the end of each block over to the next one
+        remainder = b''
+        while True:
+            data = csv_file.read(block_size)
+            if not data:
+                break
+            data = remainder + data
+            cut = data.rfind(b'\n') + 1
+            remainder = data[cut:]
+            if cut:
+                yield pv.read_csv(pa.py_buffer(data[:cut]), read_options=read_options, convert_options=convert_options)
+
+        if remainder.strip():
+            yield pv.read_csv(pa.py_buffer(remainder), read_options=read_options, convert_options=convert_options)
+
+def csv_source(csv_file_path, profile):
+    """
+    This function will return the identity of a CSV file and Parquet profile that a converted file is recorded with.
+    """
+    stat = os.stat(csv_file_path)
+    return {'path': os.path.abspath(csv_file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'profile': profile}
+
+def parquet_is_current(csv_file_path, parquet_file_path, profile):
+    """
+    This function will return whether a Parquet file was converted from the current content of a CSV file with a profile,
+    going by the source recorded in its metadata (and the CSV's size and modification time).
+    """
+    if not os.path.exists(parquet_file_path):
+        return False
+    metadata = pq.read_schema(parquet_file_path).metadata or {}
+    if PARQUET_SOURCE_METADATA_KEY not in metadata:
+        return False
+    return json.loads(metadata[PARQUET_SOURCE_METADATA_KEY]) == json.loads(json.dumps(csv_source(csv_file_path, profile)))
+
+def convert_csv_to_parquet(csv_file_path, parquet_file_path, block_size=CSV_BLOCK_SIZE, profile=None, validator=None):
+    """
+    This function will stream a CSV file into a Parquet file one block at a time, with the settings of a profile,
+    validating every block on the way when a validator is given.
+    """
+    profile = profile or PARQUET_PROFILES[PARQUET_PROFILE]
+    row_group_rows = profile['row_group_rows']
+    start = time.perf_counter()
+
+    # buffer the csv blocks and write them in row groups of row_group_rows rows
+    rows = 0
+    pending = []
+    pending_rows = 0
+    # the file is written next to its final name and renamed into place once complete (and valid)
+    file_schema = CSV_SCHEMA.with_metadata({PARQUET_SOURCE_METADATA_KEY: json.dumps(csv_source(csv_file_path, profile))})
+    with pq.ParquetWriter(parquet_file_path + '.tmp', file_schema, **parquet_write_options(profile)) as writer:
+        for block in iter_csv_blocks(csv_file_path, block_size):
+            if validator is not None:
+                valid = validator.validate(block)
+                if valid is not None:
+                    block = block.filter(valid)
+            pending.append(block)
+            pending_rows += block.num_rows
+            rows += block.num_rows
+            if pending_rows >= row_group_rows:
+                table = pa.concat_tables(pending)
+                full_rows = pending_rows - pending_rows % row_group_rows
+                writer.write_table(table.slice(0, full_rows), row_group_size=row_group_rows)
+                pending = [table.slice(full_rows)]
+                pending_rows -= full_rows
+        if pending_rows:
+            writer.write_table(pa.concat_tables(pending), row_group_size=row_group_rows)
+    if validator is not None:
+        validator.finish()
+    os.replace(parquet_file_path + '.tmp', parquet_file_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"Converted {rows:,} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/sec), peak memory {peak_memory_mb():,.0f} MB\n")
+    return rows
+
+def encode_block(block):
+    """
+    This function will re-encode a parsed CSV block (or any Arrow table of sales rows) to a batch of numpy arrays
+    that uses the shared lookup tables.
+    """
+    batch = {}
+    for column in schema.COLUMNS:
+        if column in schema.DICTIONARIES:
+            # map each chunk's own dictionary onto the shared lookup table, then look every row up through that map
+            chunk_codes = [np.empty(0, dtype=schema.CODE_DTYPE)]
+            for array in block.column(column).chunks:
+                code_map = pc.index_in(array.dictionary, value_set=schema.ARROW_DICTIONARIES[column])
+                if code_map.null_count and pc.take(code_map, array.indices).null_count:
+                    unknown_values = pc.filter(array.dictionary, pc.is_null(code_map)).to_pylist()
+                    raise ValueError(f"Unknown {column} values in data: {unknown_values[:10]}")
+                codes = code_map.fill_null(-1).to_numpy(zero_copy_only=False).astype(schema.CODE_DTYPE)
+                chunk_codes.append(codes[array.indices.to_numpy()])
+            batch[column] = np.concatenate(chunk_codes)
+            continue
+        array = block.column(column).combine_chunks()
+        if column == 'date':
+            batch[column] = array.cast(pa.int32()).to_numpy()
+        else:
+            batch[column] = array.to_numpy()
+    return batch
+
+def partition_path(dataset_directory, region_code, month):
+    """
+    This function will return the directory of a region and month (months since 1970-01) in the partitioned dataset.
+    """
+    return os.path.join(dataset_directory, f"region={schema.REGION_NAMES[region_code]}",
+                        f"year={1970 + month // 12}", f"month={month % 12 + 1:02d}")
+
+def spill_block(batch, spill_directory, spill_writers, by_region=True):
+    """
+    This function will append the rows of a block to the spill file of each region (optional) and month they belong to.
+    """
+    months = batch['date'].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    keys = batch['region'].astype(np.int64) << 32 | months if by_region else months
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+
+    for rows in np.split(order, boundaries):
+        key = int(keys[rows[0]])
+        if key not in spill_writers:
+            spill_writers[key] = pa.ipc.new_file(os.path.join(spill_directory, f"{key}.arrow"), schema.ARROW_SCHEMA)
+        spill_writers[key].write_batch(schema.batch_to_arrow({column: values[rows] for column, values in batch.items()}))
+
+def write_sorted_partition(spill_file_path, file_path, profile):
+    """
+    This function will sort one spilled partition by date and location and write it as a Parquet file.
+    """
+    with pa.memory_map(spill_file_path) as source:
+        batch = schema.arrow_to_batch(pa.ipc.open_file(source).read_all())
+    order = np.lexsort((batch['location'], batch['date']))
+    table = pa.Table.from_batches([schema.batch_to_arrow({column: values[order] for column, values in batch.items()})])
+
+    # the region is held by the partition directory
+    table = table.drop_columns(['region'])
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    pq.write_table(table, file_path, row_group_size=profile['row_group_rows'], **parquet_write_options(profile))
+    return table.num_rows
+
+def write_partitioned_files(csv_file_path, output_directory, file_name, block_size=CSV_BLOCK_SIZE, profile=None, validator=None):
+    """
+    This function will convert a CSV file to one Parquet file per region and month, sorted by date and location,
+    validating every block on the way when a validator is given.
+    It also returns the first and last date of every location in the CSV.
+    """
+    profile = profile or PARQUET_PROFILES[PARQUET_PROFILE]
+    spill_directory = tempfile.mkdtemp(prefix='.spill-', dir=output_directory)
+    first_dates = np.full(len(schema.LOCATION_NAMES), np.iinfo(schema.DATE_DTYPE).max, dtype=schema.DATE_DTYPE)
+    last_dates = np.full(len(schema.LOCATION_NAMES), np.iinfo(schema.DATE_DTYPE).min, dtype=schema.DATE_DTYPE)
+    try:
+        # pass 1: spill the csv blocks to one arrow file per partition
+        spill_writers = {}
+        try:
+            for block in iter_csv_blocks(csv_file_path, block_size):
+                if validator is not None:
+                    valid = validator.validate(block)
+                    if valid is not None:
+                        block = block.filter(valid)
+                batch = encode_block(block)
+                np.minimum.at(first_dates, batch['location'], batch['date'])
+                np.maximum.at(last_dates, batch['location'], batch['date'])
+                spill_block(batch, spill_directory, spill_writers)
+        finally:
+            for writer in spill_writers.values():
+                writer.close()
+        if validator is not None:
+            validator.finish()
+
+        # pass 2: sort and write each partition
+        rows = 0
+        output_paths = []
+        for key in sorted(spill_writers):
+            region_code, month = key >> 32, key & 0xFFFFFFFF
+            spill_file_path = os.path.join(spill_directory, f"{key}.arrow")
+            file_path = os.path.join(partition_path(output_directory, region_code, month), file_name)
+            rows += write_sorted_partition(spill_file_path, file_path, profile)
+            output_paths.append(os.path.relpath(file_path, output_directory))
+            os.remove(spill_file_path)
+    finally:
+        shutil.rmtree(spill_directory, ignore_errors=True)
+
+    location_dates = {
+        schema.LOCATION_NAMES[code]: [str(np.datetime64(int(first_dates[code]), 'D')), str(np.datetime64(int(last_dates[code]), 'D'))]
+        for code in np.flatnonzero(first_dates <= last_dates)
+    }
+    return rows, output_paths, location_dates
+
+def file_sha256(file_path):
+    """
+    This function will return the sha256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for data in iter(lambda: file.read(CSV_BLOCK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+def load_manifest(dataset_directory):
+    """
+    This function will load the manifest of a partitioned dataset, or an empty manifest if there is none.
+    """
+    manifest_path = os.path.join(dataset_directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {'files': {}}
+    with open(manifest_path) as file:
+        return json.load(file)
+
+def save_manifest(dataset_directory, manifest):
+    """
+    This function will replace the manifest of a partitioned dataset atomically.
+    """
+    manifest_path = os.path.join(dataset_directory, MANIFEST_FILE_NAME)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def plan_conversions(staging_data_directory, manifest, profile):
+    """
+    This function will compare the staging directory with the manifest and return the CSV files to convert,
+    the manifest entries of unchanged files and the CSV files that left the staging directory.
+    """
+    staged_files = {}
+    for csv_file_name in sorted(os.listdir(staging_data_directory)):
+        if csv_file_name.endswith('.csv'):
+            csv_file_path = os.path.join(staging_data_directory, csv_file_name)
+            staged_files[os.path.abspath(csv_file_path)] = os.stat(csv_file_path)
+
+    to_convert = []
+    unchanged = {}
+    for csv_file_path, stat in staged_files.items():
+        entry = manifest['files'].get(csv_file_path)
+        if entry is not None and entry['profile'] == profile:
+            # same size and modification time: trust the manifest without reading the file
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                unchanged[csv_file_path] = entry
+                continue
+            # touched or copied but identical content: only refresh the recorded size and time
+            if entry['size'] == stat.st_size and entry['sha256'] == file_sha256(csv_file_path):
+                unchanged[csv_file_path] = {**entry, 'mtime_ns': stat.st_mtime_ns}
+                continue
+        to_convert.append((csv_file_path, stat))
+
+    removed = [csv_file_path for csv_file_path in manifest['files'] if csv_file_path not in staged_files]
+    return to_convert, unchanged, removed
+
+def validation_report_path(validation_directory, csv_file_path):
+    """
+    This function will return the path of the validation report of a CSV file.
+    """
+    return os.path.join(validation_directory, f"{os.path.splitext(os.path.basename(csv_file_path))[0]}.json")
+
+def convert_staging_file(csv_file_path, size, mtime_ns, dataset_directory, profile, validation=None):
+    """
+    This function will convert one staged CSV file into a hidden work directory of the dataset (process pool task).
+    validation holds the validator's report directory and thresholds, or is None to skip validation.
+    """
+    start = time.perf_counter()
+    sha256 = file_sha256(csv_file_path)
+    # the part name only depends on the csv name, so a reconverted csv's parts replace the previous ones in place
+    file_name = f"part-{os.path.splitext(os.path.basename(csv_file_path))[0]}.parquet"
+    validator = None
+    if validation is not None:
+        validator = SalesDataValidator(csv_file_path, validation_report_path(validation['directory'], csv_file_path),
+                                       max_invalid_rows=validation['max_invalid_rows'], max_date_gaps=validation['max_date_gaps'])
+    work_directory = tempfile.mkdtemp(prefix='.work-', dir=dataset_directory)
+    try:
+        rows, output_paths, location_dates = write_partitioned_files(csv_file_path, work_directory, file_name, profile=profile, validator=validator)
+    except BaseException:
+        shutil.rmtree(work_directory, ignore_errors=True)
+        raise
+    return {
+        'entry': {
+            'path': csv_file_path,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'sha256': sha256,
+            'profile': profile,
+            'rows': rows,
+            'outputs': output_paths,
+            'location_dates': location_dates,
+        },
+        'work_directory': work_directory,
+        'seconds': time.perf_counter() - start,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+def use_portfolio(portfolio_path):
+    """
+    This function will switch the location lookup table to a store portfolio (also the process pool initializer).
+    """
+    schema.set_locations(load_portfolio(portfolio_path))
+
+def find_overlaps(files, converted_paths):
+    """
+    This function will return the pairs of CSV files (at least one of them converted in this run) whose date ranges
+    overlap for a location, with the overlapping locations. entries recorded without location dates are not checked.
+    """
+    overlaps = []
+    checked = set()
+    for csv_file_path in converted_paths:
+        location_dates = files[csv_file_path]['location_dates']
+        for other_path, other_entry in files.items():
+            pair = frozenset((csv_file_path, other_path))
+            if other_path == csv_file_path or pair in checked or 'location_dates' not in other_entry:
+                continue
+            checked.add(pair)
+            other_location_dates = other_entry['location_dates']
+            locations = [
+                location for location, (first_date, last_date) in location_dates.items()
+                if location in other_location_dates
+                and first_date <= other_location_dates[location][1] and other_location_dates[location][0] <= last_date
+            ]
+            if locations:
+                overlaps.append({'files': sorted(pair), 'locations': len(locations), 'examples': sorted(locations)[:10]})
+    return overlaps
+
+def commit_conversions(dataset_directory, manifest, conversions, unchanged, removed):
+    """
+    This function will move converted files into the dataset, remove the outputs they replace and save the manifest.
+    """
+    # a converted part renames over the part of the same csv and region-month, so readers see either its old or its
+    # new rows. only the parts of region-months that a csv no longer covers (or of removed csv files) are deleted
+    files = dict(unchanged)
+    replaced_outputs = []
+    for conversion in conversions:
+        entry = conversion['entry']
+        for output_path in entry['outputs']:
+            file_path = os.path.join(dataset_directory, output_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(os.path.join(conversion['work_directory'], output_path), file_path)
+        shutil.rmtree(conversion['work_directory'], ignore_errors=True)
+        previous_entry = manifest['files'].get(entry['path'])
+        if previous_entry is not None:
+            replaced_outputs.extend(set(previous_entry['outputs']) - set(entry['outputs']))
+        files[entry['path']] = entry
+
+    for csv_file_path in removed:
+        replaced_outputs.extend(manifest['files'][csv_file_path]['outputs'])
+
+    for output_path in replaced_outputs:
+        file_path = os.path.join(dataset_directory, output_path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        # drop partition directories left empty, up to the dataset directory (which holds the manifest)
+        try:
+            os.removedirs(os.path.dirname(file_path))
+        except OSError:
+            pass
+
+    manifest = {'files': files}
+    save_manifest(dataset_directory, manifest)
+    return manifest
+
+def update_partitioned_dataset(staging_data_directory, dataset_directory, workers=1, profile=None, portfolio_path=None, validation=None):
+    """
+    This function will convert the new and changed CSV files of the staging directory into the partitioned dataset,
+    and return the manifest and the paths of the CSV files that were converted or removed.
+    """
+    profile = profile or PARQUET_PROFILES[PARQUET_PROFILE]
+    start = time.perf_counter()
+    os.makedirs(dataset_directory, exist_ok=True)
+
+    # work directories left behind by an interrupted run
+    for file_name in os.listdir(dataset_directory):
+        if file_name.startswith('.work-'):
+            shutil.rmtree(os.path.join(dataset_directory, file_name), ignore_errors=True)
+
+    manifest = load_manifest(dataset_directory)
+    to_convert, unchanged, removed = plan_conversions(staging_data_directory, manifest, profile)
+
+    if not to_convert and not removed:
+        if unchanged != manifest['files']:
+            manifest = {'files': unchanged}
+            save_manifest(dataset_directory, manifest)
+        print(f"No new or changed CSV files ({len(unchanged):,} up to date), checked in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+        return manifest, []
+
+    for csv_file_path, _ in to_convert:
+        print(f"Converting {csv_file_path}")
+    tasks = [(csv_file_path, stat.st_size, stat.st_mtime_ns, dataset_directory, profile, validation) for csv_file_path, stat in to_convert]
+
+    conversions = []
+    try:
+        if workers > 1 and len(tasks) > 1:
+            initializer, initargs = (use_portfolio, (portfolio_path,)) if portfolio_path is not None else (None, ())
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=initializer, initargs=initargs) as executor:
+                for conversion in executor.map(convert_staging_file, *zip(*tasks)):
+                    conversions.append(conversion)
+        else:
+            for task in tasks:
+                conversions.append(convert_staging_file(*task))
+    except BaseException:
+        for conversion in conversions:
+            shutil.rmtree(conversion['work_directory'], ignore_errors=True)
+        raise
+
+    # rows of a location and date staged in two csv files would be counted twice in the dataset
+    files = {**unchanged, **{conversion['entry']['path']: conversion['entry'] for conversion in conversions}}
+    overlaps = find_overlaps(files, [conversion['entry']['path'] for conversion in conversions])
+    if overlaps:
+        for conversion in conversions:
+            shutil.rmtree(conversion['work_directory'], ignore_errors=True)
+        details = '; '.join(f"{' and '.join(overlap['files'])} ({overlap['locations']:,} locations, e.g. {', '.join(overlap['examples'][:3])})"
+                            for overlap in overlaps)
+        raise ValidationError(f"Staged CSV files overlap, their rows would be counted twice: {details}", {'overlaps': overlaps})
+
+    manifest = commit_conversions(dataset_directory, manifest, conversions, unchanged, removed)
+
+    rows = sum(conversion['entry']['rows'] for conversion in conversions)
+    elapsed = time.perf_counter() - start
+    peak_worker_memory = max([conversion['peak_memory_mb'] for conversion in conversions], default=0)
+    print(f"\nConverted {len(conversions):,} CSV files ({rows:,} rows) and removed {len(removed):,} in {elapsed:.1f} s "
+          f"({rows / elapsed:,.0f} rows/sec), peak worker memory {peak_worker_memory:,.0f} MB\n")
+    return manifest, [conversion['entry']['path'] for conversion in conversions] + removed
+
+def dataset_filter(start_date=None, end_date=None, regions=None, partitioned=True):
+    """
+    This function will build a dataset filter on region and date range that prunes partitions (when partitioned)
+    and row groups.
+    """
+    conditions = []
+    if regions:
+        conditions.append(ds.field('region').isin(list(regions)))
+    if start_date is not None:
+        start_date = np.datetime64(start_date, 'D')
+        start_month = start_date.astype('datetime64[M]').astype(np.int64)
+        year, month = 1970 + start_month // 12, start_month % 12 + 1
+        # the year/month condition skips whole files, the date condition skips row groups by their statistics
+        if partitioned:
+            conditions.append((ds.field('year') > year) | ((ds.field('year') == year) & (ds.field('month') >= month)))
+        conditions.append(ds.field('date') >= pa.scalar(start_date.astype(object), type=pa.date32()))
+    if end_date is not None:
+        end_date = np.datetime64(end_date, 'D')
+        end_month = end_date.astype('datetime64[M]').astype(np.int64)
+        year, month = 1970 + end_month // 12, end_month % 12 + 1
+        if partitioned:
+            conditions.append((ds.field('year') < year) | ((ds.field('year') == year) & (ds.field('month') <= month)))
+        conditions.append(ds.field('date') <= pa.scalar(end_date.astype(object), type=pa.date32()))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def data_version(data_path):
+    """
+    This function will return the version of the raw data: a hash of the manifest entries of a partitioned dataset,
+    or of the content of a single Parquet file.
+    """
+    if os.path.isdir(data_path):
+        entries = sorted((entry['sha256'], json.dumps(entry['profile'], sort_keys=True)) for entry in load_manifest(data_path)['files'].values())
+        return hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:16]
+    return file_sha256(data_path)[:16]
+
+def iter_raw_tables(data_path):
+    """
+    This function will yield the raw rows of a Parquet file (one row group at a time) or of a partitioned dataset
+    (one region-month partition at a time) as Arrow tables.
+    """
+    if not os.path.isdir(data_path):
+        parquet_file = pq.ParquetFile(data_path)
+        for row_group in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(row_group, columns=schema.COLUMNS)
+        return
+
+    dataset = ds.dataset(data_path, format='parquet', partitioning=dataset_partitioning())
+    partitions = sorted({tuple(sorted(ds.get_partition_keys(fragment.partition_expression).items())) for fragment in dataset.get_fragments()})
+    for partition in partitions:
+        partition_filter = None
+        for field_name, value in partition:
+            condition = ds.field(field_name) == value
+            partition_filter = condition if partition_filter is None else partition_filter & condition
+        yield dataset.to_table(columns=schema.COLUMNS, filter=partition_filter)
+
+def rollup_to_arrow(batch, columns, rollup_name, source_version):
+    """
+    This function will convert a rollup batch to an Arrow table with dictionary-encoded strings and version metadata.
+    """
+    arrays = []
+    for column in columns:
+        if column in schema.DICTIONARIES:
+            arrays.append(pa.DictionaryArray.from_arrays(batch[column], schema.ARROW_DICTIONARIES[column]))
+        elif column in ['date', 'month']:
+            arrays.append(pa.array(batch[column], type=pa.date32()))
+        else:
+            arrays.append(pa.array(batch[column]))
+    table = pa.Table.from_arrays(arrays, names=columns)
+    return table.replace_schema_metadata({'rollup': rollup_name, 'source_version': source_version})
+
+def build_rollup_tables(data_path, source_version):
+    """
+    This function will aggregate the raw data into the rollup tables in one streaming pass and return them by name.
+    """
+    # daily cube: one row per location, date and menu item (region and category follow from location and menu item).
+    # partial aggregates are merged whenever they pile up, so memory is bounded by the size of the cube
+    partials = []
+    partial_rows = 0
+    source_rows = 0
+    for table in iter_raw_tables(data_path):
+        source_rows += table.num_rows
+        partial = schema.aggregate_batch(encode_block(table))
+        partials.append(partial)
+        partial_rows += schema.batch_length(partial)
+        if partial_rows >= ROLLUP_MERGE_ROWS:
+            partials = [schema.aggregate_batch(schema.concat_batches(partials))]
+            partial_rows = schema.batch_length(partials[0])
+    daily = schema.aggregate_batch(schema.concat_batches(partials))
+    order = np.lexsort((daily['menu_item'], daily['location'], daily['date']))
+    daily = {column: values[order] for column, values in daily.items()}
+
+    # monthly: the daily cube with every date moved to the first day of its month
+    month_days = daily['date'].astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(schema.DATE_DTYPE)
+    monthly = schema.aggregate_batch({**daily, 'date': month_days})
+    order = np.lexsort((monthly['menu_item'], monthly['location'], monthly['date']))
+    monthly = {('month' if column == 'date' else column): values[order] for column, values in monthly.items()}
+
+    tables = {
+        'daily': rollup_to_arrow(daily, schema.COLUMNS, 'daily', source_version),
+        'monthly': rollup_to_arrow(monthly, ['region', 'location', 'month', 'category', 'menu_item', 'quantity_sold', 'net_sales'],
+                                   'monthly', source_version),
+    }
+
+    # per-dimension totals over the whole date range, with int64 sums
+    for dimension in ROLLUP_DIMENSIONS:
+        value_count = len(schema.DICTIONARIES[dimension])
+        totals = {
+            dimension: np.arange(value_count, dtype=schema.CODE_DTYPE),
+            'quantity_sold': np.bincount(daily[dimension], weights=daily['quantity_sold'], minlength=value_count).astype(np.int64),
+            'net_sales': np.bincount(daily[dimension], weights=daily['net_sales'], minlength=value_count).astype(np.int64),
+        }
+        tables[f"by_{dimension}"] = rollup_to_arrow(totals, [dimension, 'quantity_sold', 'net_sales'], f"by_{dimension}", source_version)
+
+    return tables, source_rows
+
+def load_rollup_metadata(rollup_directory):
+    """
+    This function will load the metadata file of a rollup directory, or None if the rollups were never built.
+    """
+    metadata_path = os.path.join(rollup_directory, ROLLUP_METADATA_FILE_NAME)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as file:
+        return json.load(file)
+
+def build_rollups(data_path, rollup_directory, force=False):
+    """
+    This function will materialize the rollup tables of the raw data unless they already match its version.
+    """
+    start = time.perf_counter()
+    source_version = data_version(data_path)
+    metadata = load_rollup_metadata(rollup_directory)
+    if not force and metadata is not None and metadata['source_version'] == source_version:
+        print(f"Rollups are up to date with source version {source_version}\n")
+        return metadata
+
+    tables, source_rows = build_rollup_tables(data_path, source_version)
+
+    # every table is written next to its final name and renamed into place, and the metadata file is replaced last
+    os.makedirs(rollup_directory, exist_ok=True)
+    metadata = {
+        'source': os.path.abspath(data_path),
+        'source_version': source_version,
+        'source_rows': source_rows,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'tables': {},
+    }
+    for rollup_name, table in tables.items():
+        file_path = os.path.join(rollup_directory, f"{rollup_name}.parquet")
+        pq.write_table(table, file_path + '.tmp', compression='zstd')
+        os.replace(file_path + '.tmp', file_path)
+        metadata['tables'][rollup_name] = {'file': f"{rollup_name}.parquet", 'rows': table.num_rows, 'columns': table.column_names}
+    with open(os.path.join(rollup_directory, ROLLUP_METADATA_FILE_NAME + '.tmp'), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(os.path.join(rollup_directory, ROLLUP_METADATA_FILE_NAME + '.tmp'), os.path.join(rollup_directory, ROLLUP_METADATA_FILE_NAME))
+
+    elapsed = time.perf_counter() - start
+    table_rows = ', '.join(f"{rollup_name} {table.num_rows:,}" for rollup_name, table in tables.items())
+    print(f"Built rollups from {source_rows:,} rows in {elapsed:.1f} s ({table_rows} rows), source version {source_version}\n")
+    return metadata
+
+def snapshot_metadata(snapshot_path):
+    """
+    This function will return the metadata of an Arrow IPC snapshot, or None if there is no snapshot.
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    with pa.memory_map(snapshot_path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return {key.decode(): value.decode() for key, value in metadata.items()}
+
+def snapshot_record_batch(columns):
+    """
+    This function will wrap the snapshot's numpy columns in an Arrow record batch without copying them.
+    """
+    arrays = []
+    for column in schema.COLUMNS:
+        values = columns[column]
+        if column in schema.DICTIONARIES:
+            arrays.append(pa.DictionaryArray.from_arrays(values, schema.ARROW_DICTIONARIES[column]))
+        else:
+            arrays.append(pa.Array.from_buffers(schema.ARROW_SCHEMA.field(column).type, len(values), [None, pa.py_buffer(values)]))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema.ARROW_SCHEMA)
+
+def write_snapshot(data_path, snapshot_path, force=False):
+    """
+    This function will write the raw data as an uncompressed Arrow IPC snapshot sorted by date and location,
+    unless the snapshot already matches the version of the raw data.
+    """
+    start = time.perf_counter()
+    source_version = data_version(data_path)
+    metadata = snapshot_metadata(snapshot_path)
+    if not force and metadata is not None and metadata.get('source_version') == source_version:
+        print(f"Snapshot is up to date with source version {source_version}\n")
+        return metadata
+
+    spill_directory = tempfile.mkdtemp(prefix='.spill-', dir=os.path.dirname(os.path.abspath(snapshot_path)))
+    try:
+        # pass 1: spill the raw rows to one arrow file per month
+        spill_writers = {}
+        rows = 0
+        try:
+            for table in iter_raw_tables(data_path):
+                batch = encode_block(table)
+                rows += schema.batch_length(batch)
+                spill_block(batch, spill_directory, spill_writers, by_region=False)
+        finally:
+            for writer in spill_writers.values():
+                writer.close()
+
+        # pass 2: sort each month by date and location into memory-mapped columns, so the snapshot is a single
+        # record batch (one contiguous buffer per column) without holding the whole dataset in memory
+        columns = {
+            column: np.lib.format.open_memmap(os.path.join(spill_directory, f"{column}.npy"), mode='w+',
+                                              dtype=schema.COLUMN_DTYPES[column], shape=(rows,))
+            for column in schema.COLUMNS
+        }
+        offset = 0
+        for key in sorted(spill_writers):
+            spill_file_path = os.path.join(spill_directory, f"{key}.arrow")
+            with pa.memory_map(spill_file_path) as source:
+                batch = schema.arrow_to_batch(pa.ipc.open_file(source).read_all())
+            order = np.lexsort((batch['location'], batch['date']))
+            for column in schema.COLUMNS:
+                columns[column][offset:offset + len(order)] = batch[column][order]
+            offset += len(order)
+            os.remove(spill_file_path)
+
+        metadata = {
+            'source_version': source_version,
+            'rows': str(rows),
+            'first_date': str(np.datetime64(int(columns['date'][0]), 'D')) if rows else '',
+            'last_date': str(np.datetime64(int(columns['date'][-1]), 'D')) if rows else '',
+            'values': json.dumps({
+                column: [names[code] for code in np.flatnonzero(np.bincount(columns[column], minlength=len(names)))]
+                for column, names in schema.DICTIONARIES.items()
+            }),
+        }
+        record_batch = snapshot_record_batch(columns)
+        with pa.OSFile(snapshot_path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, schema.ARROW_SCHEMA.with_metadata(metadata)) as writer:
+                writer.write_batch(record_batch)
+        del record_batch, columns
+    finally:
+        shutil.rmtree(spill_directory, ignore_errors=True)
+
+    # processes that memory-mapped the old snapshot keep reading it until they reopen the path
+    os.replace(snapshot_path + '.tmp', snapshot_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows:,} rows to snapshot {snapshot_path} ({convert_bytes(os.path.getsize(snapshot_path))}) in {elapsed:.1f} s, "
+          f"source version {source_version}\n")
+    return metadata
+
+def remove_stale_snapshot(data_path, snapshot_path):
+    """
+    This function will remove an Arrow IPC snapshot that does not match the version of the raw data (when the snapshot
+    is skipped), since the dashboard reads the snapshot in place of the raw data whenever it exists.
+    """
+    metadata = snapshot_metadata(snapshot_path)
+    if metadata is None or metadata.get('source_version') == data_version(data_path):
+        return
+    os.remove(snapshot_path)
+    print(f"Removed the snapshot {snapshot_path}, which no longer matches the raw data\n")
+
+def print_file_sizes(csv_file_path, parquet_file_path):
+    """
+    This function will print the file sizes of the CSV and Parquet files and the compression ratio.
+    """
+    csv_size_bytes = os.path.getsize(csv_file_path)
+    parquet_size_bytes = os.path.getsize(parquet_file_path)
+    print(f"CSV File Size: {convert_bytes(csv_size_bytes)}\n")
+    print(f"Parquet File Size: {convert_bytes(parquet_size_bytes)}\n")
+    print(f"Parquet File Compression Ratio: {csv_size_bytes / parquet_size_bytes:.2f}x\n")
+    print(f"Parquet size as a percentage of CSV size: {parquet_size_bytes / csv_size_bytes * 100:.2f}%\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert staged CSV files to the dashboard's Parquet data.")
+    parser.add_argument('--layout', choices=LAYOUTS, default='file', help="single parquet file or partitioned dataset")
+    parser.add_argument('--profile', choices=PARQUET_PROFILES, default=PARQUET_PROFILE, help="parquet profile (codec, dictionary, row group size)")
+    parser.add_argument('--row-group-rows', type=int, default=None, help="override the profile's rows per row group")
+    parser.add_argument('--portfolio', default=None, help="store portfolio parquet file the csv was generated from")
+    parser.add_argument('--skip-validation', action='store_true', help="do not validate the converted csv files")
+    parser.add_argument('--max-invalid-rows', type=int, default=MAX_INVALID_ROWS, help="invalid rows tolerated per csv before failing")
+    parser.add_argument('--max-date-gaps', type=int, default=MAX_DATE_GAPS, help="missing location-days tolerated per csv before failing")
+    parser.add_argument('--skip-rollups', action='store_true', help="do not build the rollup tables")
+    parser.add_argument('--skip-snapshot', action='store_true', help="do not write the arrow ipc snapshot")
+    parser.add_argument('--workers', type=int, default=1, help="processes converting staged csv files in parallel (partitioned layout)")
+    args = parser.parse_args()
+
+    if args.portfolio:
+        use_portfolio(args.portfolio)
+
+    profile = dict(PARQUET_PROFILES[args.profile])
+    if args.row_group_rows:
+        profile['row_group_rows'] = args.row_group_rows
+    print(f"\nParquet profile: {args.profile} {profile}\n")
+
+    # ensure the app data directory exists
+    if not os.path.exists(APP_DATA_DIRECTORY):
+        os.makedirs(APP_DATA_DIRECTORY)
+
+    validation = None
+    if not args.skip_validation:
+        validation = {'directory': os.path.join(APP_DATA_DIRECTORY, VALIDATION_DIRECTORY_NAME),
+                      'max_invalid_rows': args.max_invalid_rows, 'max_date_gaps': args.max_date_gaps}
+
+    if args.layout == 'partitioned':
+        dataset_directory = os.path.join(APP_DATA_DIRECTORY, 'sales_data')
+        try:
+            manifest, changed_files = update_partitioned_dataset(STAGING_DATA_DIRECTORY, dataset_directory, workers=args.workers,
+                                                               profile=profile, portfolio_path=args.portfolio, validation=validation)
+        except ValidationError as error:
+            print(f"\n{error}\n")
+            sys.exit(1)
+        if changed_files:
+            dataset_files = [os.path.join(root, f) for root, _, files in os.walk(dataset_directory) for f in files if f.endswith('.parquet')]
+            print(f"Partitioned Parquet dataset at {dataset_directory} holds {len(manifest['files']):,} CSV files\n")
+            print(f"CSV Files Size: {convert_bytes(sum(entry['size'] for entry in manifest['files'].values()))}\n")
+            print(f"Dataset Size: {convert_bytes(sum(os.path.getsize(f) for f in dataset_files))} in {len(dataset_files):,} files\n")
+        if not args.skip_rollups:
+            build_rollups(dataset_directory, os.path.join(APP_DATA_DIRECTORY, ROLLUP_DIRECTORY_NAME))
+        if args.skip_snapshot:
+            remove_stale_snapshot(dataset_directory, os.path.join(APP_DATA_DIRECTORY, SNAPSHOT_FILE_NAME))
+        else:
+            write_snapshot(dataset_directory, os.path.join(APP_DATA_DIRECTORY, SNAPSHOT_FILE_NAME))
+        sys.exit(0)
+
+    latest_csv_file = find_latest_csv_file(STAGING_DATA_DIRECTORY)
+
+    # print the name of the latest CSV file
+    print(f"\nLatest CSV file found: {latest_csv_file}\n")
+
+    parquet_file_path = os.path.join(APP_DATA_DIRECTORY, 'sales_data.parquet')
+    if parquet_is_current(latest_csv_file, parquet_file_path, profile):
+        print(f"Parquet file {parquet_file_path} is up to date with {latest_csv_file}, skipping the conversion\n")
+    else:
+        validator = None
+        if validation is not None:
+            validator = SalesDataValidator(latest_csv_file, validation_report_path(validation['directory'], latest_csv_file),
+                                           max_invalid_rows=args.max_invalid_rows, max_date_gaps=args.max_date_gaps)
+        try:
+            convert_csv_to_parquet(latest_csv_file, parquet_file_path, profile=profile, validator=validator)
+        except ValidationError as error:
+            os.remove(parquet_file_path + '.tmp')
+            print(f"\n{error}\n")
+            sys.exit(1)
+
+        print(f"\nCSV file {latest_csv_file} successfully converted to Parquet at {parquet_file_path}\n")
+
+        # print the file sizes of the CSV and Parquet files
+        print_file_sizes(latest_csv_file, parquet_file_path)
+
+    if not args.skip_rollups:
+        build_rollups(parquet_file_path, os.path.join(APP_DATA_DIRECTORY, ROLLUP_DIRECTORY_NAME))
+    if args.skip_snapshot:
+        remove_stale_snapshot(parquet_file_path, os.path.join(APP_DATA_DIRECTORY, SNAPSHOT_FILE_NAME))
+    else:
+        write_snapshot(parquet_file_path, os.path.join(APP_DATA_DIRECTORY, SNAPSHOT_FILE_NAME))
@@ -0,0 +1,184 @@
+'''
+# sales_data_schema.py
+
+goals:
+- define the columnar, dictionary-encoded representation of generated sales data
+
+functionality:
+- the repeated string columns (region, location, category, menu_item) are held as small integer codes
+  into fixed lookup tables that are derived once from restaurant_details.py
+- dates are held as int32 day numbers since 1970-01-01 (the arrow date32 layout)
+- a batch is a dictionary of typed numpy arrays:
+    - region, location, category, menu_item: int16 codes
+    - date: int32 day numbers
+    - quantity_sold, net_sales: int32
+- batches only become strings at output time, as arrow dictionary arrays or pandas categoricals,
+  and because every batch shares the same lookup tables the codes are identical across row groups and files
+- the location lookup table follows restaurant_details.locations unless set_locations() switches it to a
+  synthetic store portfolio (see store_portfolio.py)
+'''
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from restaurant_details import (locations,
+                                regional_monthly_seasonality_distribution,
+                                menu,
+                                )
+
+CODE_DTYPE = np.int16
+DATE_DTYPE = np.int32
+VALUE_DTYPE = np.int32
+
+# lookup tables: the position of each name is its code
+REGION_NAMES = list(regional_monthly_seasonality_distribution.keys())
+LOCATION_NAMES = list(locations.keys())
+CATEGORY_NAMES = list(menu.keys())
+MENU_ITEM_NAMES = [menu_item for category in CATEGORY_NAMES for menu_item in menu[category]]
+
+REGION_CODES = {region: code for code, region in enumerate(REGION_NAMES)}
+LOCATION_CODES = {location_name: code for code, location_name in enumerate(LOCATION_NAMES)}
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORY_NAMES)}
+MENU_ITEM_CODES = {menu_item: code for code, menu_item in enumerate(MENU_ITEM_NAMES)}
+
+# price of each menu item, indexed by menu item code
+MENU_ITEM_PRICES = np.array([menu[category][menu_item] for category in CATEGORY_NAMES for menu_item in menu[category]], dtype=VALUE_DTYPE)
+
+# category code of each menu item, indexed by menu item code
+MENU_ITEM_CATEGORY_CODES = np.array([CATEGORY_CODES[category] for category in CATEGORY_NAMES for _ in menu[category]], dtype=CODE_DTYPE)
+
+# menu item codes and prices for each category, used by the numpy engine to draw items
+CATEGORY_MENU_ITEM_CODES = {
+    category: np.array([MENU_ITEM_CODES[menu_item] for menu_item in menu[category]], dtype=CODE_DTYPE)
+    for category in CATEGORY_NAMES
+}
+CATEGORY_MENU_ITEM_PRICES = {
+    category: np.array(list(menu[category].values()), dtype=VALUE_DTYPE)
+    for category in CATEGORY_NAMES
+}
+
+# lookup table for each encoded column
+DICTIONARIES = {
+    'region': REGION_NAMES,
+    'location': LOCATION_NAMES,
+    'category': CATEGORY_NAMES,
+    'menu_item': MENU_ITEM_NAMES,
+}
+
+COLUMNS = ['region', 'location', 'date', 'category', 'menu_item', 'quantity_sold', 'net_sales']
+
+COLUMN_DTYPES = {
+    'region': CODE_DTYPE,
+    'location': CODE_DTYPE,
+    'date': DATE_DTYPE,
+    'category': CODE_DTYPE,
+    'menu_item': CODE_DTYPE,
+    'quantity_sold': VALUE_DTYPE,
+    'net_sales': VALUE_DTYPE,
+}
+
+# arrow schema of the generated dataset, shared by every row group written to parquet
+ARROW_SCHEMA = pa.schema([
+    ('region', pa.dictionary(pa.int16(), pa.string())),
+    ('location', pa.dictionary(pa.int16(), pa.string())),
+    ('date', pa.date32()),
+    ('category', pa.dictionary(pa.int16(), pa.string())),
+    ('menu_item', pa.dictionary(pa.int16(), pa.string())),
+    ('quantity_sold', pa.int32()),
+    ('net_sales', pa.int32()),
+])
+
+ARROW_DICTIONARIES = {column: pa.array(names, type=pa.string()) for column, names in DICTIONARIES.items()}
+
+# Function to switch the location lookup table to another portfolio of locations
+def set_locations(portfolio):
+    global LOCATION_NAMES, LOCATION_CODES
+    if len(portfolio) > np.iinfo(CODE_DTYPE).max + 1:
+        raise ValueError(f"Portfolio has {len(portfolio):,} locations, more than {CODE_DTYPE.__name__} location codes can hold")
+    unknown_regions = {location['region'] for location in portfolio.values()} - set(REGION_NAMES)
+    if unknown_regions:
+        raise ValueError(f"Unknown regions in portfolio: {sorted(unknown_regions)}")
+
+    LOCATION_NAMES = list(portfolio.keys())
+    LOCATION_CODES = {location_name: code for code, location_name in enumerate(LOCATION_NAMES)}
+    DICTIONARIES['location'] = LOCATION_NAMES
+    ARROW_DICTIONARIES['location'] = pa.array(LOCATION_NAMES, type=pa.string())
+
+# Function to make an empty batch
+def empty_batch():
+    return {column: np.empty(0, dtype=COLUMN_DTYPES[column]) for column in COLUMNS}
+
+# Function to concatenate batches column by column
+def concat_batches(batches):
+    batches = list(batches)
+    if not batches:
+        return empty_batch()
+    return {column: np.concatenate([batch[column] for batch in batches]) for column in COLUMNS}
+
+# Function to count the rows in a batch
+def batch_length(batch):
+    return len(batch['net_sales'])
+
+# Function to aggregate a batch to one row per location, date and menu_item
+# (region and category follow from location and menu_item). rows come out sorted by location, date, category, menu_item
+def aggregate_batch(batch):
+    if batch_length(batch) == 0:
+        return batch
+
+    # pack the grouping columns into a single int64 key, so the groups are found with one sort
+    keys = (
+        (batch['location'].astype(np.int64) << 48)
+        | ((batch['date'].astype(np.int64) & 0xFFFFFFFF) << 16)
+        | batch['menu_item'].astype(np.int64)
+    )
+    unique_keys, first_rows, group_ids = np.unique(keys, return_index=True, return_inverse=True)
+    group_count = len(unique_keys)
+
+    aggregated = {column: batch[column][first_rows] for column in ['region', 'location', 'date', 'category', 'menu_item']}
+    aggregated['quantity_sold'] = np.bincount(group_ids, weights=batch['quantity_sold'], minlength=group_count).astype(VALUE_DTYPE)
+    aggregated['net_sales'] = np.bincount(group_ids, weights=batch['net_sales'], minlength=group_count).astype(VALUE_DTYPE)
+    return aggregated
+
+# Function to convert a batch to an arrow record batch with dictionary-encoded string columns
+def batch_to_arrow(batch):
+    arrays = []
+    for column in COLUMNS:
+        if column in ARROW_DICTIONARIES:
+            arrays.append(pa.DictionaryArray.from_arrays(batch[column], ARROW_DICTIONARIES[column]))
+        elif column == 'date':
+            arrays.append(pa.array(batch[column], type=pa.date32()))
+        else:
+            arrays.append(pa.array(batch[column], type=pa.int32()))
+    return pa.RecordBatch.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+# Function to convert a batch to a pandas DataFrame with categorical string columns
+def batch_to_pandas(batch):
+    data = {}
+    for column in COLUMNS:
+        if column in DICTIONARIES:
+            data[column] = pd.Categorical.from_codes(batch[column], categories=DICTIONARIES[column])
+        elif column == 'date':
+            data[column] = batch[column].astype('datetime64[D]').astype('datetime64[s]')
+        else:
+            data[column] = batch[column]
+    return pd.DataFrame(data)
+
+# Function to convert an arrow table or record batch that uses the shared lookup tables (as written by
+# batch_to_arrow) back to a batch of numpy arrays. columns missing from the table are left out of the batch
+def arrow_to_batch(table):
+    if isinstance(table, pa.Table):
+        table = table.combine_chunks()
+    batch = {}
+    for column in COLUMNS:
+        if column not in table.column_names:
+            continue
+        array = table.column(column)
+        if isinstance(array, pa.ChunkedArray):
+            array = array.chunk(0) if array.num_chunks else pa.array([], type=array.type)
+        if column in DICTIONARIES:
+            batch[column] = array.indices.to_numpy(zero_copy_only=False).astype(CODE_DTYPE, copy=False)
+        elif column == 'date':
+            batch[column] = array.cast(pa.int32()).to_numpy(zero_copy_only=False)
+        else:
+            batch[column] = array.to_numpy(zero_copy_only=False).astype(COLUMN_DTYPES[column], copy=False)
+    return batch
@@ -0,0 +1,195 @@
+'''
+# sales_data_validation.py
+
+goals:
+- check the data the pipeline converts while it streams, so bad staging files are caught before the dashboard
+  serves them, without a second pass over the csv or a pandas materialization
+
+functionality:
+- SalesDataValidator.validate() runs on every parsed csv block (an arrow table) with pyarrow compute kernels:
+    - nulls: null count per column
+    - non_positive_quantity: rows with quantity_sold <= 0
+    - net_sales_mismatch: rows where net_sales != quantity_sold x the menu price of the item (menu in restaurant_details.py)
+    - unknown_values: rows whose region, location, category or menu_item is not in the lookup tables, with the values
+- a row failing any of these checks counts once towards invalid_rows, and validate() returns the mask of valid rows
+  so the pipeline can leave the invalid rows the thresholds tolerate out of its output
+- date coverage is tracked in a location x day bitmap while the blocks stream by, and finish() reports the days
+  missing between each location's first and last date (date_gaps)
+- thresholds:
+    - max_invalid_rows: validation fails as soon as more rows than this are invalid (fail fast, mid-file)
+    - max_date_gaps: validation fails at the end of the file when more location-days than this are missing
+- the report is a small json file (one per csv), written when validation passes, fails fast or fails at the end
+- a failed validation raises ValidationError, which stops the conversion before any output is committed
+
+usage:
+- used by sales_data_pipeline.py for every converted csv (reports in APP_DATA_DIRECTORY/validation)
+- python data_pipeline/sales_data_pipeline.py --max-invalid-rows 100 --max-date-gaps 0
+'''
+
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import sales_data_schema as schema
+
+# default thresholds: the generator never writes invalid rows or skips days
+MAX_INVALID_ROWS = 0
+MAX_DATE_GAPS = 0
+
+# values and locations listed in the report for each finding
+REPORT_EXAMPLES = 10
+
+class ValidationError(ValueError):
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+    # keep the report when the error is raised in a process pool worker
+    def __reduce__(self):
+        return (ValidationError, (str(self), self.report))
+
+class SalesDataValidator:
+    def __init__(self, source, report_path=None, max_invalid_rows=MAX_INVALID_ROWS, max_date_gaps=MAX_DATE_GAPS):
+        self.source = source
+        self.report_path = report_path
+        self.max_invalid_rows = max_invalid_rows
+        self.max_date_gaps = max_date_gaps
+        self.rows = 0
+        self.invalid_rows = 0
+        self.null_counts = {column: 0 for column in schema.COLUMNS}
+        self.non_positive_quantity = 0
+        self.net_sales_mismatch = 0
+        self.unknown_rows = {column: 0 for column in schema.DICTIONARIES}
+        self.unknown_values = {column: set() for column in schema.DICTIONARIES}
+        self.menu_item_prices = pa.array(schema.MENU_ITEM_PRICES)
+        # location x day bitmap of the dates seen, starting at first_day and grown as later or earlier dates appear
+        self.first_day = None
+        self.coverage = np.zeros((len(schema.LOCATION_NAMES), 0), dtype=bool)
+
+    # Function to check one block and return a boolean mask of its valid rows (None when every row is valid)
+    def validate(self, block):
+        if block.num_rows == 0:
+            return None
+        block = block.unify_dictionaries().combine_chunks()
+        self.rows += block.num_rows
+        invalid = pa.array(np.zeros(block.num_rows, dtype=bool))
+
+        for column in schema.COLUMNS:
+            array = block.column(column)
+            if array.null_count:
+                self.null_counts[column] += array.null_count
+                invalid = pc.or_(invalid, pc.is_null(array))
+
+        # look every row's dictionary value up in the shared lookup table: unknown values come back null
+        codes = {}
+        for column in schema.DICTIONARIES:
+            array = block.column(column).chunk(0)
+            code_map = pc.index_in(array.dictionary, value_set=schema.ARROW_DICTIONARIES[column])
+            codes[column] = pc.take(code_map, array.indices)
+            if code_map.null_count:
+                unknown = pc.and_(pc.is_null(codes[column]), pc.is_valid(array))
+                unknown_rows = pc.sum(unknown).as_py() or 0
+                if unknown_rows:
+                    self.unknown_rows[column] += unknown_rows
+                    self.unknown_values[column].update(pc.filter(array.dictionary, pc.is_null(code_map)).to_pylist())
+                    invalid = pc.or_(invalid, unknown)
+
+        quantity_sold = block.column('quantity_sold')
+        non_positive = pc.fill_null(pc.less_equal(quantity_sold, 0), False)
+        self.non_positive_quantity += pc.sum(non_positive).as_py() or 0
+        expected_net_sales = pc.multiply(quantity_sold, pc.take(self.menu_item_prices, codes['menu_item']))
+        mismatch = pc.fill_null(pc.not_equal(block.column('net_sales'), expected_net_sales), False)
+        self.net_sales_mismatch += pc.sum(mismatch).as_py() or 0
+        invalid = pc.or_(invalid, pc.or_(non_positive, mismatch))
+
+        invalid_rows = pc.sum(invalid).as_py() or 0
+        self.invalid_rows += invalid_rows
+        self.track_coverage(codes['location'], block.column('date'))
+
+        if self.invalid_rows > self.max_invalid_rows:
+            self.fail(f"{self.invalid_rows:,} invalid rows in the first {self.rows:,} rows of {self.source} "
+                      f"(threshold {self.max_invalid_rows:,})", stopped_early=True)
+        return pc.invert(invalid) if invalid_rows else None
+
+    # Function to mark the location-days of a block in the coverage bitmap
+    def track_coverage(self, location_codes, dates):
+        seen = pc.and_(pc.is_valid(location_codes), pc.is_valid(dates))
+        location_codes = pc.filter(location_codes, seen).to_numpy()
+        days = pc.filter(dates, seen).cast(pa.int32()).to_numpy()
+        if len(days) == 0:
+            return
+
+        first_day, last_day = int(days.min()), int(days.max())
+        if self.first_day is None:
+            self.first_day = first_day
+            self.coverage = np.zeros((len(schema.LOCATION_NAMES), last_day - first_day + 1), dtype=bool)
+        if first_day < self.first_day:
+            self.coverage = np.pad(self.coverage, ((0, 0), (self.first_day - first_day, 0)))
+            self.first_day = first_day
+        if last_day - self.first_day + 1 > self.coverage.shape[1]:
+            self.coverage = np.pad(self.coverage, ((0, 0), (0, last_day - self.first_day + 1 - self.coverage.shape[1])))
+        self.coverage[location_codes, days - self.first_day] = True
+
+    # Function to find the days missing between each location's first and last date
+    def date_gaps(self):
+        seen_days = self.coverage.sum(axis=1)
+        has_days = seen_days > 0
+        first = np.argmax(self.coverage, axis=1)
+        last = self.coverage.shape[1] - 1 - np.argmax(self.coverage[:, ::-1], axis=1)
+        missing_days = np.where(has_days, last - first + 1 - seen_days, 0)
+
+        examples = {}
+        for location_code in np.flatnonzero(missing_days)[:REPORT_EXAMPLES]:
+            row = self.coverage[location_code, first[location_code]:last[location_code] + 1]
+            missing = np.flatnonzero(~row)[:REPORT_EXAMPLES] + first[location_code] + self.first_day
+            examples[schema.LOCATION_NAMES[location_code]] = [str(np.datetime64(int(day), 'D')) for day in missing]
+        return {
+            'locations': int(np.count_nonzero(missing_days)),
+            'missing_days': int(missing_days.sum()),
+            'examples': examples,
+        }
+
+    def report(self, passed, stopped_early=False):
+        return {
+            'source': self.source,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'passed': passed,
+            'stopped_early': stopped_early,
+            'rows': self.rows,
+            'invalid_rows': self.invalid_rows,
+            'thresholds': {'max_invalid_rows': self.max_invalid_rows, 'max_date_gaps': self.max_date_gaps},
+            'checks': {
+                'nulls': {column: count for column, count in self.null_counts.items() if count},
+                'non_positive_quantity': self.non_positive_quantity,
+                'net_sales_mismatch': self.net_sales_mismatch,
+                'unknown_values': {
+                    column: {'rows': self.unknown_rows[column], 'values': sorted(map(str, self.unknown_values[column]))[:REPORT_EXAMPLES]}
+                    for column in schema.DICTIONARIES if self.unknown_rows[column]
+                },
+                'date_gaps': self.date_gaps(),
+            },
+        }
+
+    def write_report(self, report):
+        if self.report_path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        with open(self.report_path + '.tmp', 'w') as file:
+            json.dump(report, file, indent=2)
+        os.replace(self.report_path + '.tmp', self.report_path)
+
+    def fail(self, message, stopped_early=False):
+        report = self.report(passed=False, stopped_early=stopped_early)
+        self.write_report(report)
+        raise ValidationError(f"Validation failed: {message}" + (f", see {self.report_path}" if self.report_path else ''), report)
+
+    # Function to check the date coverage once the whole file has streamed by, and write the report
+    def finish(self):
+        report = self.report(passed=True)
+        missing_days = report['checks']['date_gaps']['missing_days']
+        if missing_days > self.max_date_gaps:
+            self.fail(f"{missing_days:,} location-days missing in {self.source} (threshold {self.max_date_gaps:,})")
+        self.write_report(report)
+        return report
@@ -0,0 +1,296 @@
+'''
+# sales_event_stream.py
+
+goals:
+- simulate a live stream of ticket-level sale events for load testing streaming ingestion and live dashboards
+
+functionality:
+- every store runs its own asyncio producer that emits sale events at --rate events per second on average
+- the rate is shaped by time of day with hourly_sales_volume_distribution in restaurant_details.py,
+  so stores are quiet overnight and peak at lunch and dinner (on a simulated clock that can run faster than real time).
+  the hour and the event date are in each store's local time, from the state time zones in restaurant_details.py
+- the mix of menu items and quantities comes from the same logic as the batch generator: each store draws a day of
+  sales with set_daily_sales_totals and simulate_sales_vectorized from sales_data_creator.py and emits those draws in
+  shuffled order, drawing the next day when they run out
+- events are emitted in small columnar batches (numpy arrays, see sales_data_schema.py) to one of three local sinks:
+    - queue: an in-process asyncio queue, consumed by a coroutine (the command line counts the events)
+    - file: newline-delimited json appended to a file
+    - socket: newline-delimited json written to a unix socket that another process is listening on
+- backpressure: the queue is bounded and the socket waits for its buffer to drain, so a slow consumer pauses the
+  producers instead of growing memory. producers then catch up by emitting the events that came due while they waited
+
+event format (one json object per line for the file and socket sinks):
+- {"event_id": "10001-42", "timestamp": 1697040000.123, "region": "Southeast", "location": "Atlanta", "date": "2023-10-11",
+   "category": "mains", "menu_item": "Burger", "quantity_sold": 2, "net_sales": 32}
+
+usage:
+- python data_pipeline/sales_event_stream.py --sink queue --rate 3000 --duration 10
+- python data_pipeline/sales_event_stream.py --sink file --path /tmp/sales_events.ndjson --rate 100 --speedup 60
+- python data_pipeline/sales_event_stream.py --sink socket --path /tmp/sales_events.sock   (after: nc -lU /tmp/sales_events.sock)
+'''
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+from restaurant_details import hourly_sales_volume_distribution, state_time_zones
+import sales_data_creator as creator
+import sales_data_schema as schema
+
+# relative event rate for each hour of the day, averaging 1 over the day
+HOURLY_RATE_MULTIPLIERS = np.array([hourly_sales_volume_distribution[hour] for hour in range(24)]) * 24
+
+# Function to convert an epoch time to seconds since the epoch on the local clock of a time zone (utc plus its offset)
+def local_seconds(epoch_seconds, time_zone):
+    return epoch_seconds + datetime.fromtimestamp(epoch_seconds, time_zone).utcoffset().total_seconds()
+
+# producers wake up this often (seconds of real time) to emit the events that came due
+TICK_SECONDS = 0.05
+
+# json-encoded names, built once so events can be formatted without json.dumps per event
+JSON_CATEGORY_NAMES = [json.dumps(name) for name in schema.CATEGORY_NAMES]
+JSON_MENU_ITEM_NAMES = [json.dumps(name) for name in schema.MENU_ITEM_NAMES]
+
+# simulated clock that starts at start_time (epoch seconds) and runs speedup times faster than real time
+class SimulatedClock:
+    def __init__(self, start_time=None, speedup=1.0):
+        self.start_time = time.time() if start_time is None else start_time
+        self.speedup = speedup
+        self.real_start = time.monotonic()
+
+    def now(self):
+        return self.start_time + (time.monotonic() - self.real_start) * self.speedup
+
+# pool of one simulated day of draws for a store, emitted in shuffled order. it is refilled with the next day's draws
+# when the store's local date changes, and with another draw of the same day if a busy day runs out
+class StoreDrawPool:
+    def __init__(self, location_name, rng):
+        self.location_name = location_name
+        self.rng = rng
+        self.item_codes = np.empty(0, dtype=schema.CODE_DTYPE)
+        self.quantities = np.empty(0, dtype=schema.VALUE_DTYPE)
+        self.position = 0
+        self.day = None
+
+    def refill(self, day):
+        _, category_sales = creator.set_daily_sales_totals(day, day, [self.location_name])
+        item_blocks = []
+        quantity_blocks = []
+        for category, daily_category_sales in zip(schema.CATEGORY_NAMES, category_sales[0, 0].tolist()):
+            item_codes, quantities = creator.simulate_sales_vectorized(category, daily_category_sales, self.rng)
+            item_blocks.append(item_codes)
+            quantity_blocks.append(quantities)
+        order = self.rng.permutation(sum(len(item_codes) for item_codes in item_blocks))
+        self.item_codes = np.concatenate(item_blocks)[order]
+        self.quantities = np.concatenate(quantity_blocks)[order]
+        self.position = 0
+        self.day = day
+
+    def take(self, count, day):
+        item_blocks = []
+        quantity_blocks = []
+        while count > 0:
+            if day != self.day or self.position >= len(self.item_codes):
+                self.refill(day)
+            taken = min(count, len(self.item_codes) - self.position)
+            item_blocks.append(self.item_codes[self.position:self.position + taken])
+            quantity_blocks.append(self.quantities[self.position:self.position + taken])
+            self.position += taken
+            count -= taken
+        return np.concatenate(item_blocks), np.concatenate(quantity_blocks)
+
+# Function to format a batch of events as newline-delimited json
+def format_events(batch):
+    location_name = schema.LOCATION_NAMES[batch['location'][0]]
+    prefix = f'{{"event_id": "{batch["store_number"]}-'
+    constant_fields = (
+        f', "region": {json.dumps(schema.REGION_NAMES[batch["region"][0]])}'
+        f', "location": {json.dumps(location_name)}'
+        f', "date": "{np.datetime64(int(batch["date"][0]), "D")}"'
+    )
+    lines = [
+        f'{prefix}{event_id}", "timestamp": {timestamp:.3f}{constant_fields}, "category": {JSON_CATEGORY_NAMES[category]}, '
+        f'"menu_item": {JSON_MENU_ITEM_NAMES[menu_item]}, "quantity_sold": {quantity_sold}, "net_sales": {net_sales}}}\n'
+        for event_id, timestamp, category, menu_item, quantity_sold, net_sales in zip(
+            batch['event_id'].tolist(), batch['timestamp'].tolist(), batch['category'].tolist(),
+            batch['menu_item'].tolist(), batch['quantity_sold'].tolist(), batch['net_sales'].tolist(),
+        )
+    ]
+    return ''.join(lines).encode()
+
+# sink that hands event batches to an in-process consumer through a bounded asyncio queue
+class QueueEventSink:
+    def __init__(self, max_batches=1024):
+        self.queue = asyncio.Queue(maxsize=max_batches)
+
+    async def send(self, batch):
+        await self.queue.put(batch)
+
+    async def close(self):
+        await self.queue.put(None)
+
+# sink that appends newline-delimited json to a file
+class FileEventSink:
+    def __init__(self, file_path):
+        self.file = open(file_path, 'ab')
+
+    async def send(self, batch):
+        self.file.write(format_events(batch))
+
+    async def close(self):
+        self.file.close()
+
+# sink that writes newline-delimited json to a listening unix socket, waiting for the buffer to drain
+class UnixSocketEventSink:
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.writer = None
+        self.connect_lock = asyncio.Lock()
+
+    async def send(self, batch):
+        # every store producer shares one connection, opened by whichever producer sends first
+        async with self.connect_lock:
+            if self.writer is None:
+                _, self.writer = await asyncio.open_unix_connection(self.socket_path)
+        self.writer.write(format_events(batch))
+        await self.writer.drain()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+# Function to emit a store's events at `rate` events per second (daily average) until stop is set
+async def produce_store_events(location_name, sink, rate, clock, rng, stats, stop):
+    pool = StoreDrawPool(location_name, rng)
+    location = creator.locations[location_name]
+    region_code = schema.REGION_CODES[location['region']]
+    location_code = schema.LOCATION_CODES[location_name]
+    time_zone = ZoneInfo(state_time_zones[location['state']])
+    next_event_id = 0
+
+    last_real_time = time.monotonic()
+    last_simulated_time = clock.now()
+    while not stop.is_set():
+        await asyncio.sleep(TICK_SECONDS)
+
+        # every event that came due since the last emission, including time spent waiting on the sink
+        real_time = time.monotonic()
+        simulated_time = clock.now()
+        # the rate follows the store's local hour, and events are dated with the store's local date
+        local_time = local_seconds(simulated_time, time_zone)
+        hour = int(local_time // 3600 % 24)
+        event_count = rng.poisson(rate * HOURLY_RATE_MULTIPLIERS[hour] * (real_time - last_real_time))
+        if event_count:
+            day = np.datetime64(int(local_time // 86400), 'D')
+            menu_item_codes, quantities = pool.take(event_count, day)
+            timestamps = np.sort(last_simulated_time + rng.random(event_count) * (simulated_time - last_simulated_time))
+            batch = {
+                'event_id': np.arange(next_event_id, next_event_id + event_count),
+                'timestamp': timestamps,
+                'store_number': location['store_number'],
+                'region': np.full(event_count, region_code, dtype=schema.CODE_DTYPE),
+                'location': np.full(event_count, location_code, dtype=schema.CODE_DTYPE),
+                'date': np.full(event_count, day.astype(schema.DATE_DTYPE), dtype=schema.DATE_DTYPE),
+                'category': schema.MENU_ITEM_CATEGORY_CODES[menu_item_codes],
+                'menu_item': menu_item_codes,
+                'quantity_sold': quantities,
+                'net_sales': schema.MENU_ITEM_PRICES[menu_item_codes] * quantities,
+            }
+            next_event_id += event_count
+            await sink.send(batch)
+            stats['events'] += event_count
+            stats['lag'] = max(stats['lag'], time.monotonic() - real_time)
+        last_real_time = real_time
+        last_simulated_time = simulated_time
+
+# Function to print throughput every interval seconds until stop is set
+async def report_throughput(stats, stop, interval=5.0):
+    last_events = 0
+    last_time = time.monotonic()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        now = time.monotonic()
+        print(f"{(stats['events'] - last_events) / (now - last_time):,.0f} events/sec, "
+              f"{stats['events']:,} total, max sink wait {stats['lag'] * 1000:.0f} ms")
+        last_events = stats['events']
+        last_time = now
+        stats['lag'] = 0.0
+
+# Function to run the stream for duration seconds (forever if None) and return the number of events emitted
+async def run_stream(sink, rate, duration=None, seed=None, start_time=None, speedup=1.0, location_names=None, report_interval=5.0):
+    if location_names is None:
+        location_names = list(creator.locations.keys())
+    clock = SimulatedClock(start_time=start_time, speedup=speedup)
+    stats = {'events': 0, 'lag': 0.0}
+    stop = asyncio.Event()
+
+    # one independent random stream per store, so stores do not share draws
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(location_names))
+    producers = [
+        asyncio.create_task(produce_store_events(location_name, sink, rate, clock, np.random.default_rng(seed_sequence), stats, stop))
+        for location_name, seed_sequence in zip(location_names, seed_sequences)
+    ]
+    reporter = asyncio.create_task(report_throughput(stats, stop, interval=report_interval))
+
+    try:
+        if duration is None:
+            await asyncio.gather(*producers)
+        else:
+            await asyncio.sleep(duration)
+    finally:
+        stop.set()
+        await asyncio.gather(*producers, reporter)
+        await sink.close()
+
+    return stats['events']
+
+# Function to consume a queue sink, counting the events it receives
+async def count_queue_events(sink):
+    events = 0
+    while True:
+        batch = await sink.queue.get()
+        if batch is None:
+            return events
+        events += len(batch['event_id'])
+
+async def main(args):
+    if args.sink == 'queue':
+        sink = QueueEventSink()
+        consumer = asyncio.create_task(count_queue_events(sink))
+    elif args.sink == 'file':
+        sink = FileEventSink(args.path)
+    else:
+        sink = UnixSocketEventSink(args.path)
+
+    start = time.monotonic()
+    events = await run_stream(sink, args.rate, duration=args.duration, seed=args.seed, start_time=args.start_time, speedup=args.speedup)
+    elapsed = time.monotonic() - start
+    if args.sink == 'queue':
+        await consumer
+    print(f"\nEmitted {events:,} events in {elapsed:.1f} s ({events / elapsed:,.0f} events/sec)\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream simulated ticket-level sale events to a local sink.")
+    parser.add_argument('--sink', choices=['queue', 'file', 'socket'], default='queue', help="where to send the events")
+    parser.add_argument('--path', default=None, help="output file (file sink) or unix socket path (socket sink)")
+    parser.add_argument('--rate', type=float, default=100.0, help="average events per second per store over a day")
+    parser.add_argument('--duration', type=float, default=None, help="seconds to run, forever if not set")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible draws")
+    parser.add_argument('--start-time', type=float, default=None, help="simulated clock start in epoch seconds, defaults to now")
+    parser.add_argument('--speedup', type=float, default=1.0, help="simulated seconds per real second")
+    parser.add_argument('--portfolio', default=None, help="store portfolio parquet file written by store_portfolio.py")
+    args = parser.parse_args()
+
+    if args.sink != 'queue' and args.path is None:
+        parser.error(f"--path is required for the {args.sink} sink")
+    if args.portfolio is not None:
+        creator.use_portfolio(args.portfolio)
+
+    asyncio.run(main(args))
@@ -0,0 +1,97 @@
+'''
+# store_portfolio.py
+
+goals:
+- scale the hand-written restaurant portfolio out to thousands of synthetic stores for load testing
+
+functionality:
+- every synthetic store is cloned from a randomly sampled template in the locations dictionary of restaurant_details.py:
+    - city, state and region are copied from the template
+    - projected_annual_sales is the template's sales with +/- 15% lognormal noise, rounded to the nearest 100,000
+    - store_number continues the template numbering, so every store has a unique number
+    - the location name is the template city followed by the store number, e.g. "Atlanta #10020"
+- the portfolio is written as a small parquet file (one row per store) that the generator reads with --portfolio,
+  and that the pipeline and dashboard can read with pandas or pyarrow to look up a store's region and attributes
+
+usage:
+- python data_pipeline/store_portfolio.py --stores 10000 --seed 42
+- python data_pipeline/sales_data_creator.py --portfolio data_pipeline/generated_data/store_portfolio_10000.parquet --format parquet --aggregate
+'''
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from restaurant_details import locations
+
+PORTFOLIO_COLUMNS = ['location', 'city', 'state', 'region', 'store_number', 'projected_annual_sales']
+
+# spread of the synthetic stores' sales around their template
+SALES_NOISE_SIGMA = 0.15
+
+# Function to build a portfolio of synthetic stores from the existing locations as templates
+# returns a dictionary shaped like restaurant_details.locations
+def scale_portfolio(store_count, seed=None):
+    rng = np.random.default_rng(seed)
+    templates = list(locations.values())
+    template_indexes = rng.integers(0, len(templates), size=store_count)
+    sales_noise = rng.lognormal(0, SALES_NOISE_SIGMA, size=store_count)
+    first_store_number = max(template['store_number'] for template in templates) + 1
+
+    portfolio = {}
+    for offset, (template_index, noise) in enumerate(zip(template_indexes.tolist(), sales_noise.tolist())):
+        template = templates[template_index]
+        store_number = first_store_number + offset
+        portfolio[f"{template['city']} #{store_number}"] = {
+            "city": template["city"],
+            "state": template["state"],
+            "projected_annual_sales": int(round(template["projected_annual_sales"] * noise, -5)),
+            "store_number": store_number,
+            "region": template["region"],
+        }
+
+    return portfolio
+
+# Function to write a portfolio to a parquet file
+def write_portfolio(portfolio, file_path):
+    portfolio_df = pd.DataFrame(
+        [{'location': location_name, **location} for location_name, location in portfolio.items()],
+        columns=PORTFOLIO_COLUMNS,
+    )
+    portfolio_df = portfolio_df.astype({'region': 'category', 'state': 'category', 'city': 'category',
+                                        'store_number': 'int32', 'projected_annual_sales': 'int64'})
+    portfolio_df.to_parquet(file_path, index=False)
+
+# Function to read a portfolio parquet file back into a dictionary shaped like restaurant_details.locations
+def load_portfolio(file_path):
+    portfolio_df = pd.read_parquet(file_path, columns=PORTFOLIO_COLUMNS)
+    return {
+        row['location']: {
+            "city": row['city'],
+            "state": row['state'],
+            "projected_annual_sales": int(row['projected_annual_sales']),
+            "store_number": int(row['store_number']),
+            "region": row['region'],
+        }
+        for row in portfolio_df.astype(object).to_dict('records')
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scale the restaurant portfolio out to N synthetic stores.")
+    parser.add_argument('--stores', type=int, required=True, help="number of synthetic stores")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible portfolios")
+    parser.add_argument('--output', default=None, help="output parquet file")
+    args = parser.parse_args()
+
+    output_file_path = args.output
+    if output_file_path is None:
+        generated_data_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generated_data')
+        os.makedirs(generated_data_directory, exist_ok=True)
+        output_file_path = os.path.join(generated_data_directory, f"store_portfolio_{args.stores}.parquet")
+
+    portfolio = scale_portfolio(args.stores, seed=args.seed)
+    write_portfolio(portfolio, output_file_path)
+
+    total_sales = sum(location['projected_annual_sales'] for location in portfolio.values())
+    print(f"\nWrote {len(portfolio):,} stores to {output_file_path}")
+    print(f"Projected annual sales: ${total_sales:,.0f}\n")